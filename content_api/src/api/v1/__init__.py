@@ -1,103 +1,287 @@
+from hashlib import blake2b
 from http import HTTPStatus
+from typing import Callable
 
-from fastapi import HTTPException
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
 
+from core.config import CURSOR_HEADER, CURSOR_START
+from db import redis
+from db.elastic import ES_MAX_SIZE
 from models.films import Film
 
 
-async def _details(_service, _id: str, index: str = None):
-    res = await _service.process_by_id(_id, index)
+def _etag(body: bytes) -> str:
+    # Сильный ETag - хэш тела ответа. Тело из кэша уже сериализовано,
+    # поэтому хэш считается без разбора записи
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # Для If-None-Match используется слабое сравнение
+    return etag in (tag.strip().removeprefix('W/')
+                    for tag in if_none_match.split(','))
+
+
+def cached_route(cache_control: str) -> type[APIRoute]:
+    """
+    Класс маршрута для APIRouter(route_class=...): добавляет к успешным
+    ответам на GET заголовки ETag и Cache-Control и отвечает
+    304 Not Modified, если клиент прислал совпадающий If-None-Match.
+    :param cache_control: значение заголовка Cache-Control для роутера
+    """
+
+    class CachedRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+
+            async def route_handler(request: Request) -> Response:
+                response = await handler(request)
+                # Тело потокового ответа заранее неизвестно
+                if request.method not in ('GET', 'HEAD') or \
+                        response.status_code != HTTPStatus.OK or \
+                        isinstance(response, StreamingResponse):
+                    return response
+
+                etag = _etag(response.body)
+                response.headers['ETag'] = etag
+                response.headers['Cache-Control'] = cache_control
+                if_none_match = request.headers.get('If-None-Match')
+                if if_none_match and _etag_matches(if_none_match, etag):
+                    headers = {k: v for k, v in response.headers.items()
+                               if k not in ('content-length', 'content-type')}
+                    return Response(status_code=HTTPStatus.NOT_MODIFIED,
+                                    headers=headers)
+                return response
+
+            return route_handler
+
+    return CachedRoute
+
+
+async def _details(_service, _id: str, index: str = None,
+                   refresh: bool = False):
+    res = await _service.process_by_id(_id, index, refresh)
     if not res:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
                             detail=f'{_id} not found in {index}')
     return res
 
 
+async def _details_payload(_service,
+                           serialize,
+                           _id: str,
+                           index: str = None,
+                           key: str = None) -> Response:
+    # Тело ответа берется из кэша как есть, без валидации response_model
+    payload = await _service.process_by_id_payload(serialize, _id, index, key)
+    if not payload:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{_id} not found in {index}')
+    return Response(content=payload, media_type='application/json')
+
+
+async def _details_list(_service,
+                        ids: list[str],
+                        index: str = None,
+                        fields: list[str] = None) -> list:
+    res = await _service.process_by_ids(ids, index, fields)
+    if not res:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{index} not found')
+    return res
+
+
 async def _list(_service,
                 index: str = None,
                 sort: str = None,
                 search: dict = None,
                 key: str = None,
                 page: int = None,
-                size: int = None):
-    res = await _service.process_list(index, sort, search, key, page, size)
+                size: int = None,
+                fields: list[str] = None,
+                tags: list[str] = None,
+                refresh: bool = False):
+    res = await _service.process_list(index, sort, search, key, page, size,
+                                      fields, tags, refresh)
     if not res:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
                             detail=f'{index} not found')
     return res
 
 
+async def _list_payload(_service,
+                        serialize,
+                        index: str = None,
+                        sort: str = None,
+                        search: dict = None,
+                        key: str = None,
+                        page: int = None,
+                        size: int = None,
+                        fields: list[str] = None,
+                        refresh_ahead: float = None,
+                        tags: list[str] = None) -> Response:
+    # Тело ответа берется из кэша как есть, без валидации response_model
+    payload = await _service.process_list_payload(serialize, index, sort,
+                                                  search, key, page, size,
+                                                  fields, refresh_ahead,
+                                                  tags=tags)
+    if not payload:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{index} not found')
+    return Response(content=payload, media_type='application/json')
+
+
+async def _composed_payload(_service,
+                            index: str = None,
+                            key: str = None,
+                            build: Callable = None) -> Response:
+    # Тело ответа из нескольких индексов кэшируется целиком, как и у
+    # _list_payload
+    payload = await _service.process_composed_payload(index, key, build)
+    if not payload:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{index} not found')
+    return Response(content=payload, media_type='application/json')
+
+
+async def _page(_service,
+                index: str = None,
+                sort: str = None,
+                search: dict = None,
+                size: int = None,
+                cursor: str = None,
+                fields: list[str] = None) -> tuple[list, str | None]:
+    # Значение CURSOR_START начинает обход с первой страницы
+    cursor = None if cursor == CURSOR_START else cursor
+    res = await _service.process_page(index, sort, search, size, cursor,
+                                      fields)
+    if not res or not res[0]:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{index} not found')
+    return res
+
+
+async def _page_payload(_service,
+                        serialize,
+                        index: str = None,
+                        sort: str = None,
+                        search: dict = None,
+                        size: int = None,
+                        cursor: str = None,
+                        fields: list[str] = None) -> Response:
+    entities, next_cursor = await _page(_service, index, sort, search, size,
+                                        cursor, fields)
+    headers = {CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(content=serialize(entities),
+                    media_type='application/json',
+                    headers=headers)
+
+
 async def _get_cache_key(args_dict: dict = None,
                          index: str = None) -> str:
-    if not args_dict:
-        args_dict = {}
+    """
+    Канонический ключ кэша: параметры без None упорядочиваются по имени и
+    хэшируются, поэтому ключ не зависит от порядка аргументов.
+    В ключ входит поколение индекса, так что увеличение поколения
+    (incr_generation, например после перестроения индекса в ETL) одной
+    записью делает недействительными все ключи индекса. Записи по id
+    включают поколение так же (IdRequestService._prefix).
+    """
+    params = {k: v for k, v in (args_dict or {}).items() if v is not None}
+    generation = await redis.redis.get_generation(index)
+    if not params:
+        return f'index:{index}:{generation}'
 
-    key = ''
-    for k, v in args_dict.items():
-        if v:
-            key += f':{k}:{v}'
+    digest = blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS),
+                     digest_size=16).hexdigest()
+    return f'index:{index}:{generation}:{digest}'
 
-    return f'index:{index}{key}' if key else f'index:{index}'
 
+# Поля фильма, достаточные для списка фильмов персоны и ее ролей
+PERSON_FILMS_FIELDS = ['id', 'title', 'imdb_rating',
+                       'actors_ids', 'writers_ids', 'directors_ids']
+# Роли персоны и поля фильма с id персон в этих ролях
+PERSON_ROLES = (('actor', 'actors_ids'),
+                ('writer', 'writers_ids'),
+                ('director', 'directors_ids'))
 
-async def _films_for_person(_service, person_id: str = None, key: str = None) \
-        -> list[Film]:
-    search = {
+
+def _person_films_query(person_ids: list[str]) -> dict:
+    # Одно условие по плоскому полю в контексте фильтра: не считает
+    # релевантность и кэшируется Elasticsearch
+    return {
         "bool": {
-            "should": [
-                {"nested": {
-                    "path": "actors",
-                    "query": {
-                        "bool": {
-                            "must": {"match": {
-                                "actors.id": person_id}}
-                        }
-                    }
-                }},
-                {"nested": {
-                    "path": "writers",
-                    "query": {
-                        "bool": {
-                            "must": {
-                                "match": {
-                                    "writers.id": person_id}}
-                        }
-                    }
-                }},
-                {"nested": {
-                    "path": "directors",
-                    "query": {
-                        "bool": {
-                            "must": {
-                                "match": {
-                                    "directors.id": person_id}}
-                        }
-                    }
-                }}
-            ]
+            "filter": {"terms": {"person_ids": person_ids}}
         }
     }
 
-    return await _list(_service, index='movies', search=search, key=key)
 
+async def _films_for_person(_service,
+                            person_id: str = None,
+                            key: str = None,
+                            refresh: bool = False) -> list[Film]:
+    search = _person_films_query([person_id])
 
-def _films_to_list(person_id: str = None, films: list[Film] = None) \
-        -> list[dict]:
-    def collect_roles(movie):
-        film_structure = {"uuid": movie.id, "roles": []}
+    # Фильмография помечается и самой персоной: фильм, в который ее только
+    # что добавили, еще не входит в запись
+    return await _list(_service, index='movies', search=search, key=key,
+                       fields=PERSON_FILMS_FIELDS,
+                       tags=[f'persons:{person_id}'],
+                       refresh=refresh)
 
-        def roles_list(persons_list, role):
-            if person_id in [actor["id"] for actor in persons_list]:
-                film_structure["roles"].append(role)
 
-        roles_list(movie.actors, 'actor')
-        roles_list(movie.writers, 'writer')
-        roles_list(movie.directors, 'director')
-        return film_structure
+async def _films_for_persons(_service,
+                             person_ids: list[str] = None,
+                             key: str = None,
+                             refresh: bool = False) -> dict[str, list[dict]]:
+    """
+    Фильмы и роли сразу для нескольких персон одним msearch в ES.
+    :return: словарь {id персоны: список фильмов с ролями}, как в
+    _films_to_list
+    """
+    # Отдельный запрос на каждую персону: фильмы одной персоны не
+    # вытесняют фильмы остальных
+    films = await _service.process_lists(
+        'movies',
+        [_person_films_query([person_id]) for person_id in person_ids],
+        key=key,
+        size=ES_MAX_SIZE,
+        fields=PERSON_FILMS_FIELDS,
+        tags=[f'persons:{person_id}' for person_id in person_ids],
+        refresh=refresh)
+    # Ни у одной персоны страницы нет фильмов - это не ошибка
+    films = films or []
 
-    films_res = []
+    return _films_to_lists(person_ids, films)
+
+
+def _films_to_lists(person_ids: list[str] = None,
+                    films: list[Film] = None) -> dict[str, list[dict]]:
+    # Один проход по фильмам вместо _films_to_list для каждой персоны
+    res = {person_id: {} for person_id in person_ids}
     for film in films:
-        films_structure = collect_roles(film)
-        films_res.append(films_structure)
+        for role, field in PERSON_ROLES:
+            for person_id in getattr(film, field) or []:
+                person_films = res.get(person_id)
+                if person_films is None:
+                    continue
+                film_structure = person_films.setdefault(
+                    film.id, {"uuid": film.id, "roles": []})
+                if role not in film_structure["roles"]:
+                    film_structure["roles"].append(role)
+
+    return {person_id: list(person_films.values())[:ES_MAX_SIZE]
+            for person_id, person_films in res.items()}
 
-    return films_res
+
+def _films_to_list(person_id: str = None, films: list[Film] = None) \
+        -> list[dict]:
+    return [{"uuid": film.id,
+             "roles": [role for role, field in PERSON_ROLES
+                       if person_id in (getattr(film, field) or [])]}
+            for film in films]
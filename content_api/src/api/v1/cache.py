@@ -0,0 +1,63 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from db.codec import codec, CodecStats
+from models.model import Model
+from services.invalidation import InvalidationService, \
+    get_invalidation_service
+from services.token import security_jwt, check_roles
+
+router = APIRouter()
+
+
+class CompressionStats(CodecStats):
+    codec: str
+    threshold: int
+    ratio: float
+
+
+class Changes(Model):
+    films: list[str] = []
+    persons: list[str] = []
+    genres: list[str] = []
+
+
+class Invalidated(Model):
+    keys: int
+
+
+@router.get('/compression',
+            response_model=CompressionStats,
+            summary="Сжатие кэша",
+            description="Степень сжатия записей кэша и время, затраченное "
+                        "на сжатие и распаковку",
+            response_description="количество записей, объем до и после "
+                                 "сжатия, время в секундах",
+            )
+async def compression_stats() -> CompressionStats:
+    return CompressionStats(codec=codec.name,
+                            threshold=codec.threshold,
+                            ratio=codec.ratio,
+                            **codec.stats.dict())
+
+
+@router.post('/invalidate',
+             response_model=Invalidated,
+             summary="Инвалидация кэша",
+             description="Удаляет из кэша записи, в которые входят "
+                         "измененные фильмы, персоны и жанры: записи по id, "
+                         "страницы списков и фильмографии персон. "
+                         "Доступно только администраторам",
+             response_description="количество удаленных ключей",
+             )
+async def invalidate(changes: Changes,
+                     token: Annotated[str, Depends(security_jwt)],
+                     service: InvalidationService = Depends(
+                         get_invalidation_service)) -> Invalidated:
+    # Сброс кэша отправляет все запросы в Elasticsearch
+    await check_roles(token, 'admin')
+    keys = await service.invalidate(changes.films,
+                                    changes.persons,
+                                    changes.genres)
+    return Invalidated(keys=len(keys))
@@ -1,12 +1,18 @@
+from datetime import datetime
+from functools import partial
 from uuid import UUID
 
+import orjson
+
 import core.config as conf
 
 from http import HTTPStatus
 from fastapi import APIRouter, Depends, HTTPException, Query, status as st
-from typing import Annotated
+from fastapi.responses import Response, StreamingResponse
+from typing import Annotated, AsyncIterator
 
-from api.v1 import _details, _list, _get_cache_key
+from api.v1 import _details_payload, _details_list, _list_payload, \
+    _page_payload, _get_cache_key, cached_route
 from services.service import IdRequestService, ListService
 from services.film import get_film_service, get_film_list_service
 
@@ -19,7 +25,8 @@ from models.model import Model, PaginateModel
 # Также она основана на дата-классах
 
 # Объект router, в котором регистрируем обработчики
-router = APIRouter()
+router = APIRouter(
+    route_class=cached_route(conf.settings.films_cache_control))
 Paginate = Annotated[PaginateModel, Depends(PaginateModel)]
 INDEX = 'movies'
 
@@ -38,6 +45,225 @@ class Film(FilmList):
     directors: list[dict] | None = None
 
 
+class GenreFacet(Model):
+    name: str
+    count: int
+
+
+class RatingFacet(Model):
+    rating: float
+    count: int
+
+
+class RatingStats(Model):
+    min: float | None = None
+    max: float | None = None
+    avg: float | None = None
+
+
+class FilmFacets(Model):
+    total: int
+    genres: list[GenreFacet]
+    imdb_rating: list[RatingFacet]
+    imdb_rating_stats: RatingStats
+
+
+# Поля ответа FilmList и соответствующие им поля документа в ES
+FILM_LIST_SOURCE = {'uuid': 'id',
+                    'title': 'title',
+                    'imdb_rating': 'imdb_rating'}
+
+
+# Поля документа, достаточные для списка названий фильмов
+FILM_TITLE_FIELDS = ['id', 'title']
+# Не больше стольких жанров в фасетах
+FACETS_MAX_GENRES = 100
+# Поля документа, доступные при выгрузке каталога
+EXPORT_FIELDS = ['id', 'title', 'imdb_rating', 'description', 'genre',
+                 'directors', 'actors', 'writers', 'actors_names',
+                 'writers_names', 'directors_ids', 'actors_ids',
+                 'writers_ids', 'person_ids', 'modified']
+
+
+def _film_list_fields(fields: str = None) -> set[str] | None:
+    if not fields:
+        return None
+    res = {field.strip() for field in fields.split(',')}
+    unknown = res - FILM_LIST_SOURCE.keys()
+    if unknown:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail=f'Unknown fields: '
+                                   f'{", ".join(sorted(unknown))}')
+    return res
+
+
+def _film_list_source(fields: set[str] = None) -> list[str]:
+    # id и title обязательны для models.films.Film
+    return sorted({'id', 'title'} |
+                  {FILM_LIST_SOURCE[field]
+                   for field in fields or FILM_LIST_SOURCE})
+
+
+def _cache_fields(fields: set[str] = None) -> str | None:
+    return ','.join(sorted(fields)) if fields else None
+
+
+def _export_fields(fields: str = None) -> list[str] | None:
+    if not fields:
+        return None
+    res = {field.strip() for field in fields.split(',')}
+    unknown = res - set(EXPORT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail=f'Unknown fields: '
+                                   f'{", ".join(sorted(unknown))}')
+    # Без id строку выгрузки не сопоставить с фильмом
+    return sorted(res | {'id'})
+
+
+def _modified_search(modified_since: datetime = None) -> dict | None:
+    if not modified_since:
+        return None
+    # Документы, загруженные до появления поля modified, отдаются всегда:
+    # время их изменения неизвестно, пока ETL или reindex.py их не обновит
+    return {
+        "bool": {
+            "should": [
+                {"range": {"modified": {"gte": modified_since.isoformat()}}},
+                {"bool": {"must_not": {"exists": {"field": "modified"}}}}
+            ],
+            "minimum_should_match": 1
+        }
+    }
+
+
+async def _ndjson(first: list[dict] | None,
+                  pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    # Одна пачка документов - один фрагмент ответа
+    if first is None:
+        return
+    yield b''.join(orjson.dumps(doc) + b'\n' for doc in first)
+    async for page in pages:
+        yield b''.join(orjson.dumps(doc) + b'\n' for doc in page)
+
+
+def _genre_search(genre: str = None) -> dict | None:
+    if not genre:
+        return None
+    return {
+        "nested": {
+            "path": "genre",
+            "query": {
+                "bool": {
+                    "must":
+                        {"match": {"genre.name": genre}}
+                }
+            }
+        }
+    }
+
+
+async def _film_list_response(film_service: ListService,
+                              sort: str = None,
+                              genre: str = None,
+                              page: int = None,
+                              size: int = None,
+                              fields: set[str] = None,
+                              refresh_ahead: float = None) -> Response:
+    # Используется и обработчиком film_list, и прогревом кэша, поэтому ключ
+    # и тело ответа у них совпадают
+    key = await _get_cache_key({'sort': sort,
+                                'genre': genre,
+                                'page': page,
+                                'size': size,
+                                'fields': _cache_fields(fields)},
+                               INDEX)
+
+    return await _list_payload(film_service,
+                               partial(_film_list_payload,
+                                       fields=fields),
+                               index=INDEX,
+                               sort=sort,
+                               search=_genre_search(genre),
+                               key=key,
+                               page=page,
+                               size=size,
+                               fields=_film_list_source(fields),
+                               refresh_ahead=refresh_ahead)
+
+
+def _film_payload(film) -> bytes:
+    # Перекладываем данные из models.Film в Film.
+    # Обратите внимание, что у модели бизнес-логики есть поле description,
+    # которое отсутствует в модели ответа API.
+    # Если бы использовалась общая модель для бизнес-логики и формирования
+    # ответов API вы бы предоставляли клиентам данные, которые им не нужны
+    # и, возможно, данные, которые опасно возвращать
+    return orjson.dumps(_film(film).dict())
+
+
+def _film(film) -> Film:
+    return Film(uuid=film.id,
+                title=film.title,
+                imdb_rating=film.imdb_rating,
+                description=film.description,
+                genre=film.genre,
+                actors=film.actors,
+                writers=film.writers,
+                directors=film.directors)
+
+
+def _film_batch_payload(films) -> bytes:
+    return orjson.dumps([_film(film).dict() for film in films])
+
+
+def _film_list_payload(films, fields: set[str] = None) -> bytes:
+    return orjson.dumps([FilmList(uuid=film.id,
+                                  title=film.title,
+                                  imdb_rating=film.imdb_rating
+                                  ).dict(include=fields)
+                         for film in films])
+
+
+def _film_facets_aggs(interval: float) -> dict:
+    return {
+        "total": {"value_count": {"field": "id"}},
+        "genres": {
+            "nested": {"path": "genre"},
+            "aggs": {
+                "names": {
+                    "terms": {"field": "genre.name.raw",
+                              "size": FACETS_MAX_GENRES},
+                    # Считаем фильмы, а не вложенные документы жанров
+                    "aggs": {"films": {"reverse_nested": {}}}
+                }
+            }
+        },
+        "imdb_rating": {
+            "histogram": {"field": "imdb_rating",
+                          "interval": interval,
+                          "min_doc_count": 0}
+        },
+        "imdb_rating_stats": {"stats": {"field": "imdb_rating"}}
+    }
+
+
+def _film_facets_payload(aggregations: dict) -> bytes:
+    stats = aggregations['imdb_rating_stats']
+    return orjson.dumps(FilmFacets(
+        total=aggregations['total']['value'],
+        genres=[GenreFacet(name=bucket['key'],
+                           count=bucket['films']['doc_count'])
+                for bucket in aggregations['genres']['names']['buckets']],
+        imdb_rating=[RatingFacet(rating=bucket['key'],
+                                 count=bucket['doc_count'])
+                     for bucket in aggregations['imdb_rating']['buckets']],
+        imdb_rating_stats=RatingStats(min=stats['min'],
+                                      max=stats['max'],
+                                      avg=stats['avg'])
+    ).dict())
+
+
 @router.get('/search',
             response_model=list[FilmList],
             summary="Поиск кинопроизведений",
@@ -52,9 +278,12 @@ async def film_search(pagination: Paginate,
                                          description=conf.SEARCH_DESC),
                       sort: str = Query(None,
                                         description=conf.SORT_DESC),
-                      ) -> list[FilmList]:
+                      fields: str = Query(None,
+                                          description=conf.FIELDS_DESC),
+                      ) -> Response:
     page = pagination.page_number
     size = pagination.page_size
+    fields = _film_list_fields(fields)
     if query:
         search = {
             "bool": {
@@ -66,25 +295,35 @@ async def film_search(pagination: Paginate,
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
                             detail=f'Empty `query` attribute')
 
+    if pagination.cursor:
+        return await _page_payload(film_service,
+                                   partial(_film_list_payload,
+                                           fields=fields),
+                                   index=INDEX,
+                                   search=search,
+                                   sort=sort,
+                                   size=size,
+                                   cursor=pagination.cursor,
+                                   fields=_film_list_source(fields))
+
     # Redis caching
     key = await _get_cache_key({'sort': sort,
                                 'query': query,
                                 'page': page,
-                                'size': size},
+                                'size': size,
+                                'fields': _cache_fields(fields)},
                                INDEX)
 
-    films = await _list(film_service,
-                        index=INDEX,
-                        search=search,
-                        sort=sort,
-                        key=key,
-                        page=page,
-                        size=size)
-
-    res = [FilmList(uuid=film.id,
-                    title=film.title,
-                    imdb_rating=film.imdb_rating) for film in films]
-    return res
+    return await _list_payload(film_service,
+                               partial(_film_list_payload,
+                                       fields=fields),
+                               index=INDEX,
+                               search=search,
+                               sort=sort,
+                               key=key,
+                               page=page,
+                               size=size,
+                               fields=_film_list_source(fields))
 
 
 @router.post('/films-titles',
@@ -94,27 +333,114 @@ async def film_search(pagination: Paginate,
              )
 async def films_details(
         film_ids_list: list[UUID],
-        film_service: ListService = Depends(get_film_list_service)) \
+        film_service: IdRequestService = Depends(get_film_service)) \
         -> list[tuple]:
-    if film_ids_list:
-        search = {
-            "ids": {
-                "values": film_ids_list
-            }
-        }
-    else:
+    if not film_ids_list:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
                             detail=f'Empty `film_ids_list` attribute')
 
-    films = await _list(film_service,
-                        index=INDEX,
-                        search=search,
-                        )
+    # Сначала ищем фильмы в кэше по id, из ES получаем только промахи
+    films = await _details_list(film_service,
+                                [str(film_id) for film_id in film_ids_list],
+                                index=INDEX,
+                                fields=FILM_TITLE_FIELDS)
 
     res = [(film.id, film.title) for film in films]
     return res
 
 
+@router.post('/batch',
+             response_model=list[Film],
+             summary="Детали фильмов по списку id",
+             description="Данные нескольких фильмов одним запросом в "
+                         "порядке id в запросе. Не найденные id "
+                         "пропускаются, повторяющиеся - возвращаются "
+                         "один раз",
+             response_description="id, название, рейтинг, описание, жанр, "
+                                  "список актеров, режиссеров и сценаристов",
+             )
+async def films_batch(
+        film_ids_list: list[UUID],
+        film_service: IdRequestService = Depends(get_film_service)) \
+        -> Response:
+    if not film_ids_list:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail='Empty `film_ids_list` attribute')
+    if len(film_ids_list) > conf.settings.films_batch_max_size:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                            detail='No more than '
+                                   f'{conf.settings.films_batch_max_size} '
+                                   'ids per request')
+
+    # Полные записи фильмов те же, что у /{film_id}: попадания читаются
+    # одним MGET, промахи - одним mget из ES и записываются в кэш одним
+    # конвейером. Не найденные id пропускаются, даже если это все id
+    films = await film_service.process_by_ids(
+        list(dict.fromkeys(str(film_id) for film_id in film_ids_list)),
+        INDEX)
+    return Response(content=_film_batch_payload(films),
+                    media_type='application/json')
+
+
+@router.get('/facets',
+            response_model=FilmFacets,
+            summary="Фасеты фильмов",
+            description="Количество фильмов по жанрам, распределение и "
+                        "статистика рейтинга одним запросом",
+            response_description="количество фильмов, жанры с количеством "
+                                 "фильмов, гистограмма рейтинга",
+            )
+async def film_facets(film_service: ListService = Depends(
+                          get_film_list_service),
+                      genre: str = Query(None,
+                                         description=conf.GENRE_DESC),
+                      interval: float = Query(1, gt=0, le=10,
+                                              description=conf.INTERVAL_DESC)
+                      ) -> Response:
+    key = await _get_cache_key({'facets': 'films',
+                                'genre': genre,
+                                'interval': interval},
+                               INDEX)
+
+    payload = await film_service.process_aggregations_payload(
+        _film_facets_payload,
+        INDEX,
+        search=_genre_search(genre),
+        aggs=_film_facets_aggs(interval),
+        key=key)
+    if not payload:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail=f'{INDEX} not found')
+    return Response(content=payload, media_type='application/json')
+
+
+@router.get('/export',
+            summary="Выгрузка каталога",
+            description="Все фильмы в формате NDJSON, по документу на "
+                        "строку. Ответ передается по мере чтения индекса и "
+                        "не ограничен окном пагинации",
+            response_description="документы фильмов в том виде, в каком "
+                                 "они хранятся в индексе",
+            response_class=StreamingResponse,
+            )
+async def film_export(film_service: ListService = Depends(
+                          get_film_list_service),
+                      fields: str = Query(None,
+                                          description=conf.FIELDS_DESC),
+                      modified_since: datetime = Query(
+                          None, description=conf.MODIFIED_SINCE_DESC)
+                      ) -> StreamingResponse:
+    pages = film_service.process_scan(INDEX,
+                                      search=_modified_search(modified_since),
+                                      size=conf.settings.export_page_size,
+                                      fields=_export_fields(fields))
+    # Первая пачка читается до начала ответа: если хранилище недоступно,
+    # клиент получит 503, а не оборванный поток
+    first = await anext(pages, None)
+    return StreamingResponse(_ndjson(first, pages),
+                             media_type='application/x-ndjson')
+
+
 # С помощью декоратора регистрируем обработчик film_details
 # На обработку запросов по адресу <some_prefix>/some_id
 # Позже подключим роутер к корневому роутеру
@@ -134,25 +460,15 @@ async def film_details(
         # token: Annotated[str, Depends(security_jwt)],
         film_service: IdRequestService = Depends(get_film_service),
         film_id: str = None,
-) -> Film:
+) -> Response:
     # await check_roles(token, 'manager admin')
-    film = await _details(film_service, film_id, INDEX)
-
-    # Перекладываем данные из models.Film в Film.
-    # Обратите внимание, что у модели бизнес-логики есть поле description,
-    # которое отсутствует в модели ответа API.
-    # Если бы использовалась общая модель для бизнес-логики и формирования
-    # ответов API вы бы предоставляли клиентам данные, которые им не нужны
-    # и, возможно, данные, которые опасно возвращать
+    key = await _get_cache_key({'id': film_id}, INDEX)
 
-    return Film(uuid=film.id,
-                title=film.title,
-                imdb_rating=film.imdb_rating,
-                description=film.description,
-                genre=film.genre,
-                actors=film.actors,
-                writers=film.writers,
-                directors=film.directors)
+    return await _details_payload(film_service,
+                                  _film_payload,
+                                  film_id,
+                                  index=INDEX,
+                                  key=key)
 
 
 @router.get('/',
@@ -166,41 +482,30 @@ async def film_list(pagination: Paginate,
                     sort: str = Query(None,
                                       description=conf.SORT_DESC),
                     genre: str = Query(None,
-                                       description=conf.GENRE_DESC)
-                    ) -> list[FilmList]:
+                                       description=conf.GENRE_DESC),
+                    fields: str = Query(None,
+                                        description=conf.FIELDS_DESC)
+                    ) -> Response:
     page = pagination.page_number
     size = pagination.page_size
+    fields = _film_list_fields(fields)
 
-    if genre:
-        search = {
-            "nested": {
-                "path": "genre",
-                "query": {
-                    "bool": {
-                        "must":
-                            {"match": {"genre.name": genre}}
-                    }
-                }
-            }
-        }
-    else:
-        search = None
+    search = _genre_search(genre)
 
-    key = await _get_cache_key({'sort': sort,
-                                'genre': genre,
-                                'page': page,
-                                'size': size},
-                               INDEX)
+    if pagination.cursor:
+        return await _page_payload(film_service,
+                                   partial(_film_list_payload,
+                                           fields=fields),
+                                   index=INDEX,
+                                   sort=sort,
+                                   search=search,
+                                   size=size,
+                                   cursor=pagination.cursor,
+                                   fields=_film_list_source(fields))
 
-    films = await _list(film_service,
-                        index=INDEX,
-                        sort=sort,
-                        search=search,
-                        key=key,
-                        page=page,
-                        size=size)
-
-    res = [FilmList(uuid=film.id,
-                    title=film.title,
-                    imdb_rating=film.imdb_rating) for film in films]
-    return res
+    return await _film_list_response(film_service,
+                                     sort=sort,
+                                     genre=genre,
+                                     page=page,
+                                     size=size,
+                                     fields=fields)
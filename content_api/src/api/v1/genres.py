@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends
-from api.v1 import _details, _list
+import orjson
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response
+
+import core.config as conf
+from api.v1 import _details_payload, _list_payload, _page_payload
 from models.model import Model
 from services.service import IdRequestService, ListService
 from services.genre import get_genre_service, get_genre_list_service
 
-from api.v1 import _get_cache_key
+from api.v1 import _get_cache_key, cached_route
 
-router = APIRouter()
+router = APIRouter(
+    route_class=cached_route(conf.settings.genres_cache_control))
 INDEX = 'genres'
+# Поля документа, нужные для списка жанров
+GENRE_LIST_FIELDS = ['id', 'name']
 
 
 # Модель ответа API
@@ -16,6 +24,28 @@ class Genre(Model):
     name: str | None = None
 
 
+def _genre_payload(genre) -> bytes:
+    return orjson.dumps(Genre(uuid=genre.id,
+                              name=genre.name).dict())
+
+
+def _genre_list_payload(genres) -> bytes:
+    return orjson.dumps([Genre(uuid=genre.id,
+                               name=genre.name).dict()
+                         for genre in genres])
+
+
+async def _genre_list_response(genre_service: ListService,
+                               refresh_ahead: float = None) -> Response:
+    key = await _get_cache_key(index=INDEX)
+    return await _list_payload(genre_service,
+                               _genre_list_payload,
+                               index=INDEX,
+                               key=key,
+                               fields=GENRE_LIST_FIELDS,
+                               refresh_ahead=refresh_ahead)
+
+
 @router.get('/{genre_id}',
             response_model=Genre,
             summary="Детали жанра",
@@ -23,11 +53,14 @@ class Genre(Model):
             response_description="id, название"
             )
 async def genre_details(genre_service: IdRequestService = Depends(get_genre_service),
-                        genre_id: str = None) -> Genre:
-    genre = await _details(genre_service, genre_id, INDEX)
+                        genre_id: str = None) -> Response:
+    key = await _get_cache_key({'id': genre_id}, INDEX)
 
-    return Genre(uuid=genre.id,
-                 name=genre.name)
+    return await _details_payload(genre_service,
+                                  _genre_payload,
+                                  genre_id,
+                                  index=INDEX,
+                                  key=key)
 
 
 @router.get('/',
@@ -36,13 +69,15 @@ async def genre_details(genre_service: IdRequestService = Depends(get_genre_serv
             description="Список жанров с информацией о id, названии",
             response_description="id, название"
             )
-async def genre_list(genre_service: ListService = Depends(get_genre_list_service)
-                     ) -> list[Genre]:
-    key = await _get_cache_key(index=INDEX)
-    genres = await _list(genre_service,
-                         index=INDEX,
-                         key=key)
+async def genre_list(genre_service: ListService = Depends(get_genre_list_service),
+                     cursor: str = Query(None,
+                                         description=conf.CURSOR_DESC)
+                     ) -> Response:
+    if cursor:
+        return await _page_payload(genre_service,
+                                   _genre_list_payload,
+                                   index=INDEX,
+                                   cursor=cursor,
+                                   fields=GENRE_LIST_FIELDS)
 
-    res = [Genre(uuid=genre.id,
-                 name=genre.name) for genre in genres]
-    return res
+    return await _genre_list_response(genre_service)
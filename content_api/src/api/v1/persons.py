@@ -1,19 +1,23 @@
+import orjson
+
 import core.config as conf
 
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from typing import Annotated
 
-from api.v1 import _details, _list, _get_cache_key, _films_for_person, \
-    _films_to_list
+from api.v1 import _composed_payload, _details, _list, _list_payload, \
+    _page, _get_cache_key, _films_for_person, _films_for_persons, \
+    _films_to_list, _person_films_query, cached_route, PERSON_FILMS_FIELDS
 from models.model import Model, PaginateModel
 from services.service import IdRequestService, ListService
 from services.person import get_person_service, get_person_list_service
 from services.film import get_film_list_service
-from api.v1.films import FilmList
+from api.v1.films import FilmList, _film_list_payload
 
-router = APIRouter()
+router = APIRouter(
+    route_class=cached_route(conf.settings.persons_cache_control))
 Paginate = Annotated[PaginateModel, Depends(PaginateModel)]
 INDEX = 'persons'
 
@@ -25,6 +29,18 @@ class Person(Model):
     films: list[dict] | None = None
 
 
+def _person_dict(person, films: list[dict]) -> dict:
+    return Person(uuid=person.id,
+                  full_name=person.full_name,
+                  films=films).dict()
+
+
+def _person_tags(persons: list, films: list[dict]) -> list[str]:
+    # Запись зависит от персон и от фильмов, в которых они участвуют
+    return [f'{INDEX}:{person.id}' for person in persons] + \
+        [f'movies:{film["uuid"]}' for film in films]
+
+
 @router.get('/search',
             response_model=list[Person],
             summary="Поиск персон",
@@ -38,7 +54,7 @@ async def person_search(pagination: Paginate,
                         film_service: ListService = Depends(get_film_list_service),
                         query: str = Query(None,
                                            description=conf.SEARCH_DESC),
-                        ) -> list[Person]:
+                        ) -> Response:
 
     page = pagination.page_number
     size = pagination.page_size
@@ -54,33 +70,51 @@ async def person_search(pagination: Paginate,
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
                             detail=f'Empty `query` attribute')
 
+    def payload(persons: list, films: dict[str, list[dict]]) -> bytes:
+        return orjson.dumps([_person_dict(person, films[person.id])
+                             for person in persons])
+
+    if pagination.cursor:
+        persons, next_cursor = await _page(person_service,
+                                           index=INDEX,
+                                           search=search,
+                                           size=size,
+                                           cursor=pagination.cursor)
+        # Страница курсора не определяется номером, ответ не кэшируем
+        films = await _films_for_persons(film_service,
+                                         [person.id for person in persons])
+        headers = {conf.CURSOR_HEADER: next_cursor} if next_cursor else None
+        return Response(content=payload(persons, films),
+                        media_type='application/json',
+                        headers=headers)
+
     key = await _get_cache_key({'query': query,
                                 'page': page,
                                 'size': size},
                                INDEX)
-
-    persons = await _list(person_service,
-                          index=INDEX,
-                          search=search,
-                          key=key,
-                          page=page,
-                          size=size)
-
-    res = [Person(uuid=person.id,
-                  full_name=person.full_name,
-                  films=_films_to_list(
-                      person.id,
-                      await _films_for_person(
-                          film_service,
-                          person.id,
-                          key=await _get_cache_key({'person_id': person.id,
-                                                    'query': query,
-                                                    'page': page,
-                                                    'size': size},
-                                                   'movies'))))
-           for person in persons]
-
-    return res
+    films_key = await _get_cache_key({'person_query': query,
+                                      'page': page,
+                                      'size': size},
+                                     'movies')
+
+    async def build(refresh: bool) -> tuple[bytes, list[str]]:
+        persons = await _list(person_service,
+                              index=INDEX,
+                              search=search,
+                              key=key,
+                              page=page,
+                              size=size,
+                              refresh=refresh)
+        # Фильмы всех персон страницы получаем одним запросом
+        films = await _films_for_persons(film_service,
+                                         [person.id for person in persons],
+                                         key=films_key,
+                                         refresh=refresh)
+        return payload(persons, films), \
+            _person_tags(persons, [film for person_films in films.values()
+                                   for film in person_films])
+
+    return await _composed_payload(person_service, INDEX, key, build)
 
 
 @router.get('/{person_id}',
@@ -90,21 +124,30 @@ async def person_search(pagination: Paginate,
             response_description="id, имя, id фильма и роли персоны в этом "
                                  "фильме",
             )
-async def person_details(person_service: IdRequestService = Depends(get_person_service),
-                         film_service: ListService = Depends(get_film_list_service),
-                         person_id: str = None) -> Person:
-    person = await _details(person_service, person_id, INDEX)
-
-    key = await _get_cache_key({'person_id': person_id},
-                               'movies')
-
-    films_res = _films_to_list(person_id,
+async def person_details(person_service: IdRequestService = Depends(
+                             get_person_service),
+                         person_list_service: ListService = Depends(
+                             get_person_list_service),
+                         film_service: ListService = Depends(
+                             get_film_list_service),
+                         person_id: str = None) -> Response:
+    key = await _get_cache_key({'id': person_id}, INDEX)
+    films_key = await _get_cache_key({'person_id': person_id},
+                                     'movies')
+
+    async def build(refresh: bool) -> tuple[bytes, list[str]]:
+        person = await _details(person_service, person_id, INDEX, refresh)
+        films = _films_to_list(person_id,
                                await _films_for_person(film_service,
                                                        person_id,
-                                                       key))
-    return Person(uuid=person.id,
-                  full_name=person.full_name,
-                  films=films_res)
+                                                       films_key,
+                                                       refresh))
+        return orjson.dumps(_person_dict(person, films)), \
+            _person_tags([person], films)
+
+    # Тело ответа кэшируется целиком: при попадании персона и фильмы
+    # не разбираются из кэша и модель ответа не строится
+    return await _composed_payload(person_list_service, INDEX, key, build)
 
 
 @router.get('/{person_id}/film',
@@ -114,12 +157,15 @@ async def person_details(person_service: IdRequestService = Depends(get_person_s
             response_description="Список фильмов с id, название, рейтинг",
             )
 async def films_by_person(film_service: ListService = Depends(get_film_list_service),
-                          person_id: str = None) -> list[FilmList]:
+                          person_id: str = None) -> Response:
     key = await _get_cache_key({'person_id': person_id},
                                'movies')
-    films = await _films_for_person(film_service, person_id, key)
 
-    res = [FilmList(uuid=film.id,
-                    title=film.title,
-                    imdb_rating=film.imdb_rating) for film in films]
-    return res
+    # Фильмография помечается и самой персоной, как в _films_for_person
+    return await _list_payload(film_service,
+                               _film_list_payload,
+                               index='movies',
+                               search=_person_films_query([person_id]),
+                               key=key,
+                               fields=PERSON_FILMS_FIELDS,
+                               tags=[f'persons:{person_id}'])
@@ -0,0 +1,107 @@
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response
+
+import core.config as conf
+from api.v1 import _get_cache_key, cached_route
+from models.model import Model
+from services.film import get_film_list_service
+from services.person import get_person_list_service
+from services.service import ListService
+
+router = APIRouter(
+    route_class=cached_route(conf.settings.suggest_cache_control))
+# Поля документов, достаточные для подсказки
+FILM_SUGGEST_FIELDS = ['id', 'title']
+PERSON_SUGGEST_FIELDS = ['id', 'full_name']
+
+
+class FilmSuggestion(Model):
+    uuid: str
+    title: str
+
+
+class PersonSuggestion(Model):
+    uuid: str
+    full_name: str
+
+
+class Suggestions(Model):
+    films: list[FilmSuggestion]
+    persons: list[PersonSuggestion]
+
+
+def _suggest_search(field: str, query: str) -> dict:
+    # Подполе suggest проиндексировано edge n-gram анализатором, поэтому
+    # каждое слово запроса совпадает с началом слова в названии
+    return {
+        "match": {
+            f"{field}.suggest": {
+                "query": query,
+                "operator": "and"
+            }
+        }
+    }
+
+
+def _film_suggest_payload(films) -> bytes:
+    return orjson.dumps([FilmSuggestion(uuid=film.id,
+                                        title=film.title).dict()
+                         for film in films])
+
+
+def _person_suggest_payload(persons) -> bytes:
+    return orjson.dumps([PersonSuggestion(uuid=person.id,
+                                          full_name=person.full_name).dict()
+                         for person in persons])
+
+
+async def _suggest(_service: ListService,
+                   serialize,
+                   index: str,
+                   field: str,
+                   fields: list[str],
+                   query: str,
+                   size: int) -> bytes:
+    key = await _get_cache_key({'suggest': query, 'size': size}, index)
+    payload = await _service.process_list_payload(
+        serialize,
+        index,
+        search=_suggest_search(field, query),
+        key=key,
+        size=size,
+        fields=fields,
+        expire=conf.settings.suggest_expire_in_seconds)
+    # Отсутствие подсказок - не ошибка
+    return payload or b'[]'
+
+
+@router.get('/',
+            response_model=Suggestions,
+            summary="Подсказки при вводе",
+            description="Фильмы и персоны, названия и имена которых "
+                        "начинаются с введенных слов",
+            response_description="id и названия фильмов, id и имена персон",
+            tags=['Полнотекстовый поиск']
+            )
+async def suggest(film_service: ListService = Depends(get_film_list_service),
+                  person_service: ListService = Depends(
+                      get_person_list_service),
+                  query: str = Query(..., min_length=1,
+                                     description=conf.SUGGEST_DESC),
+                  size: int = Query(10, ge=1, le=50,
+                                    description=conf.SIZE_DESC),
+                  ) -> Response:
+    query = query.strip().lower()
+    films, persons = await asyncio.gather(
+        _suggest(film_service, _film_suggest_payload, 'movies', 'title',
+                 FILM_SUGGEST_FIELDS, query, size),
+        _suggest(person_service, _person_suggest_payload, 'persons',
+                 'full_name', PERSON_SUGGEST_FIELDS, query, size))
+
+    # Склеиваем готовые тела из кэша без разбора
+    return Response(content=b'{"films":' + films +
+                            b',"persons":' + persons + b'}',
+                    media_type='application/json')
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from datetime import datetime
+from time import monotonic
+
+import orjson
+from fastapi import APIRouter, HTTPException
+
+from api.v1 import films, genres
+from core.config import settings
+from db import elastic, redis
+from models.model import Model
+from models.films import Film
+from models.genres import Genre
+from services.service import ListService
+
+router = APIRouter()
+# Ключ блокировки, которой воркеры и реплики делят прогрев
+WARMUP_LOCK = 'warmup'
+
+
+class WarmupStatus(Model):
+    running: bool = False
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    duration: float | None = None
+
+
+class CacheWarmer:
+    """
+    Заранее заполняет кэш для самых запрашиваемых ключей: первые страницы
+    списка фильмов (без фильтра и с фильтром по каждому жанру), список
+    жанров и фильмы с наивысшим рейтингом.
+    Ключи и тела ответов те же, что у обработчиков, поскольку используются
+    их же функции. Обновляются отсутствующие ключи и ключи, которые
+    устареют раньше следующего прогрева: иначе горячий ключ истек бы
+    между запусками.
+    За интервал прогрев выполняет один воркер из всех: блокировка в кэше
+    не снимается после прогрева, а истекает к следующему запуску.
+    """
+
+    def __init__(self):
+        self.status = WarmupStatus()
+        self._task: asyncio.Task | None = None
+
+    async def warm(self):
+        if self.status.running:
+            return
+        # Блокировка живет весь интервал и намеренно не снимается: снятая
+        # сразу после прогрева, она позволила бы другому воркеру повторить
+        # его, не дожидаясь интервала
+        if not await redis.redis.lock(
+                WARMUP_LOCK, settings.warmup_interval_in_seconds):
+            logging.info('Кэш прогревает другой воркер')
+            return
+
+        self.status = WarmupStatus(running=True, started_at=datetime.utcnow())
+        started = monotonic()
+        ahead = settings.warmup_interval_in_seconds
+        film_service = ListService(redis.redis, elastic.es, Film)
+        genre_service = ListService(redis.redis, elastic.es, Genre)
+        semaphore = asyncio.Semaphore(settings.warmup_concurrency)
+
+        async def run(coro):
+            async with semaphore:
+                try:
+                    await coro
+                except Exception:
+                    self.status.failed += 1
+                    logging.exception('Не удалось прогреть ключ кэша')
+                finally:
+                    self.status.done += 1
+
+        try:
+            try:
+                response = await genres._genre_list_response(
+                    genre_service, refresh_ahead=ahead)
+                genre_names = [genre['name']
+                               for genre in orjson.loads(response.body)]
+            except HTTPException:
+                genre_names = []
+            self.status.total = 1
+            self.status.done = 1
+
+            jobs = []
+            for page in range(1, settings.warmup_pages + 1):
+                for genre in [None] + genre_names:
+                    jobs.append(films._film_list_response(film_service,
+                                                          genre=genre,
+                                                          page=page,
+                                                          size=50,
+                                                          refresh_ahead=ahead))
+                jobs.append(films._film_list_response(film_service,
+                                                      sort='-imdb_rating',
+                                                      page=page,
+                                                      size=50,
+                                                      refresh_ahead=ahead))
+            self.status.total += len(jobs)
+            await asyncio.gather(*[run(job) for job in jobs])
+        finally:
+            self.status.running = False
+            self.status.finished_at = datetime.utcnow()
+            self.status.duration = monotonic() - started
+            logging.info(f'Прогрев кэша: {self.status.done} ключей за '
+                         f'{self.status.duration:.2f} с, ошибок: '
+                         f'{self.status.failed}')
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                await self.warm()
+            except Exception:
+                logging.exception('Прогрев кэша прерван')
+            await asyncio.sleep(settings.warmup_interval_in_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+warmer = CacheWarmer()
+
+
+@router.get('/',
+            response_model=WarmupStatus,
+            summary="Прогрев кэша",
+            description="Ход и длительность последнего прогрева кэша",
+            response_description="количество ключей, ошибок, длительность "
+                                 "в секундах",
+            )
+async def warmup_status() -> WarmupStatus:
+    return warmer.status
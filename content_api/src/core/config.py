@@ -18,6 +18,68 @@ class Settings(BaseSettings):
     host_auth: str = Field(..., env='HOST_AUTH')
     port_auth: str = Field(..., env='PORT_AUTH')
     cache_expire_in_seconds: int = Field(..., env='CACHE_EXPIRE_IN_SECONDS')
+    # Сколько еще после cache_expire_in_seconds запись отдается устаревшей,
+    # пока она обновляется в фоне. 0 - отключено
+    cache_stale_in_seconds: int = Field(0, env='CACHE_STALE_IN_SECONDS')
+    auth_local_verify: bool = Field(False, env='AUTH_LOCAL_VERIFY')
+    secret_key: str | None = Field(None, env='SECRET_KEY')
+    roles_cache_expire_in_seconds: int = Field(
+        60, env='ROLES_CACHE_EXPIRE_IN_SECONDS')
+    # Сколько помнить, что по id или по ключу списка ничего не найдено.
+    # 0 - не запоминать
+    negative_cache_id_expire_in_seconds: float = Field(
+        30, env='NEGATIVE_CACHE_ID_EXPIRE_IN_SECONDS')
+    negative_cache_list_expire_in_seconds: float = Field(
+        10, env='NEGATIVE_CACHE_LIST_EXPIRE_IN_SECONDS')
+    negative_cache_max_items: int = Field(100000,
+                                          env='NEGATIVE_CACHE_MAX_ITEMS')
+    storage_timeout_in_seconds: float = Field(
+        5, env='STORAGE_TIMEOUT_IN_SECONDS')
+    circuit_breaker_failure_threshold: int = Field(
+        5, env='CIRCUIT_BREAKER_FAILURE_THRESHOLD')
+    circuit_breaker_reset_timeout: float = Field(
+        30, env='CIRCUIT_BREAKER_RESET_TIMEOUT')
+    circuit_breaker_half_open_max_calls: int = Field(
+        1, env='CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS')
+    cache_lock_enabled: bool = Field(False, env='CACHE_LOCK_ENABLED')
+    cache_lock_timeout: float = Field(5, env='CACHE_LOCK_TIMEOUT')
+    cache_lock_poll_interval: float = Field(0.05,
+                                            env='CACHE_LOCK_POLL_INTERVAL')
+    local_cache_enabled: bool = Field(True, env='LOCAL_CACHE_ENABLED')
+    local_cache_expire_in_seconds: float = Field(
+        10, env='LOCAL_CACHE_EXPIRE_IN_SECONDS')
+    local_cache_max_items: int = Field(10000, env='LOCAL_CACHE_MAX_ITEMS')
+    local_cache_max_bytes: int = Field(64 * 1024 * 1024,
+                                       env='LOCAL_CACHE_MAX_BYTES')
+    # Сжатие записей кэша: none, zlib, zstd или lz4
+    cache_compression: str = Field('none', env='CACHE_COMPRESSION')
+    cache_compression_threshold: int = Field(
+        1024, env='CACHE_COMPRESSION_THRESHOLD')
+    cache_compression_level: int = Field(3, env='CACHE_COMPRESSION_LEVEL')
+    # Заголовок Cache-Control ответов на GET для каждого роутера
+    films_cache_control: str = Field(
+        'public, max-age=60, stale-while-revalidate=300',
+        env='FILMS_CACHE_CONTROL')
+    genres_cache_control: str = Field(
+        'public, max-age=300, stale-while-revalidate=600',
+        env='GENRES_CACHE_CONTROL')
+    persons_cache_control: str = Field(
+        'public, max-age=60, stale-while-revalidate=300',
+        env='PERSONS_CACHE_CONTROL')
+    suggest_cache_control: str = Field('public, max-age=30',
+                                       env='SUGGEST_CACHE_CONTROL')
+    # Подсказки кэшируются ненадолго: запросов много, и они разные
+    suggest_expire_in_seconds: float = Field(
+        30, env='SUGGEST_EXPIRE_IN_SECONDS')
+    warmup_enabled: bool = Field(True, env='WARMUP_ENABLED')
+    warmup_interval_in_seconds: float = Field(
+        240, env='WARMUP_INTERVAL_IN_SECONDS')
+    warmup_concurrency: int = Field(4, env='WARMUP_CONCURRENCY')
+    warmup_pages: int = Field(1, env='WARMUP_PAGES')
+    # Сколько документов читается из индекса за раз при выгрузке каталога
+    export_page_size: int = Field(1000, env='EXPORT_PAGE_SIZE')
+    # Сколько фильмов можно запросить одним запросом /films/batch
+    films_batch_max_size: int = Field(100, env='FILMS_BATCH_MAX_SIZE')
 
     class Config:
         env_file = '.env'
@@ -28,8 +90,18 @@ settings = Settings()
 SORT_DESC = "Сортировка. По умолчанию по возрастанию." \
             "'-' в начале - по убыванию."
 SEARCH_DESC = "Поиск по названию"
+INTERVAL_DESC = "Ширина интервала гистограммы рейтинга"
+SUGGEST_DESC = "Начало названия фильма или имени персоны"
 PAGE_DESC = "Номер страницы"
 PAGE_ALIAS = "page_number"
 SIZE_DESC = "Количество элементов на странице"
 SIZE_ALIAS = "page_size"
 GENRE_DESC = "Жанр фильма"
+FIELDS_DESC = "Поля ответа через запятую. По умолчанию - все поля"
+MODIFIED_SINCE_DESC = "Только фильмы, измененные начиная с этого " \
+                      "времени, и фильмы без времени изменения"
+CURSOR_DESC = "Курсор для обхода без ограничения глубины. '*' - первая " \
+              "страница, далее значение заголовка X-Next-Cursor. " \
+              "page_number при этом не учитывается."
+CURSOR_START = '*'
+CURSOR_HEADER = 'X-Next-Cursor'
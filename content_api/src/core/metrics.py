@@ -0,0 +1,123 @@
+import os
+from functools import wraps
+from time import perf_counter
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, \
+    REGISTRY, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Время запросов к Redis и Elasticsearch - от долей миллисекунды
+FAST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1,
+                2.5, 5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_LATENCY = Histogram(
+    'content_api_request_duration_seconds',
+    'Время обработки запроса',
+    ['method', 'route', 'status'])
+RESPONSE_SIZE = Histogram(
+    'content_api_response_size_bytes',
+    'Размер тела ответа',
+    ['route'],
+    buckets=SIZE_BUCKETS)
+CACHE_REQUESTS = Counter(
+    'content_api_cache_requests_total',
+    'Обращения к кэшу: hit, stale - устаревшая запись, обновляемая в фоне, '
+    'miss, missing - сработала отметка об отсутствии данных',
+    ['namespace', 'result'])
+SERIALIZE_LATENCY = Histogram(
+    'content_api_serialize_duration_seconds',
+    'Время сборки тела ответа для кэша',
+    ['namespace'],
+    buckets=FAST_BUCKETS)
+STORAGE_LATENCY = Histogram(
+    'content_api_storage_duration_seconds',
+    'Время запросов к Elasticsearch',
+    ['index', 'operation'],
+    buckets=FAST_BUCKETS)
+CACHE_LATENCY = Histogram(
+    'content_api_cache_duration_seconds',
+    'Время запросов к Redis',
+    ['operation'],
+    buckets=FAST_BUCKETS)
+
+
+def cache_result(namespace: str, found: bool, fresh_for: float = 0):
+    if not found:
+        result = 'miss'
+    elif fresh_for <= 0:
+        result = 'stale'
+    else:
+        result = 'hit'
+    CACHE_REQUESTS.labels(namespace, result).inc()
+
+
+def timed_cache(func):
+    """Замеряет время метода кэша, метка operation - имя метода."""
+    histogram = CACHE_LATENCY.labels(func.__name__)
+
+    @wraps(func)
+    async def inner(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(perf_counter() - started)
+
+    return inner
+
+
+def latest() -> bytes:
+    # Несколько воркеров gunicorn пишут метрики в общий каталог
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время и размер ответа по шаблону маршрута, а не по
+    пути запроса, чтобы число рядов не зависело от id в адресах
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: dict = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = next((r.path for r in scope['app'].routes
+                          if getattr(r, 'endpoint', None) is endpoint),
+                         'unmatched')
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route(scope)
+            REQUEST_LATENCY.labels(scope['method'], route,
+                                   status).observe(perf_counter() - started)
+            RESPONSE_SIZE.labels(route).observe(size)
@@ -1,5 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Optional
+
+
+class StorageUnavailableError(Exception):
+    """
+    Хранилище не ответило вовремя, вернуло ошибку или отключено
+    размыкателем цепи
+    """
 
 
 class AbstractStorage(ABC):
@@ -8,8 +15,13 @@ class AbstractStorage(ABC):
     Описывает какие методы должны быть у подобных классов.
     get_by_id - возвращает один экземпляр класса модели,
     по которой строятся получение из хранилища
+    get_by_ids - возвращает экземпляры класса модели для списка id
     get_list - возвращает список объектов модели, переданной в
     качестве параметра.
+    get_page - возвращает страницу списка объектов модели и курсор
+    следующей страницы.
+    get_aggregations - возвращает результаты агрегаций по документам.
+    scan - обходит все документы по запросу пачками.
     """
 
     @abstractmethod
@@ -23,9 +35,25 @@ class AbstractStorage(ABC):
         """
         ...
 
+    @abstractmethod
+    async def get_by_ids(self, ids: list[str], index: str, model,
+                         fields: list[str] = None) -> list:
+        """
+        Абстрактный асинхронный метод для получения данных по списку id
+        одним запросом
+        :param ids: список id, по которым выполняется поиск
+        :param index: строковое название индекса, в котором выполняется поиск
+        :param model: тип модели, в котором возвращаются данные
+        :param fields: список полей документа, которые нужно получить из
+        хранилища. По умолчанию - все поля
+        :return: список найденных объектов типа model
+        """
+        ...
+
     @abstractmethod
     async def get_list(self, model, index: str, sort: str, search: dict,
-                       page: int, size: int) -> list | None:
+                       page: int, size: int,
+                       fields: list[str] = None) -> list | None:
         """
         Абстрактный асинхронный метод для получения списка данных
         :param model: тип модели, в котором возвращаются данные
@@ -35,10 +63,81 @@ class AbstractStorage(ABC):
         :param search: словарь с параметрами для поиска, если они необходимы
         :param page: номер страницы
         :param size: количество элементов на странице(в списке)
+        :param fields: список полей документа, которые нужно получить из
+        хранилища. По умолчанию - все поля
         :return: список объектов типа model
         """
         ...
 
+    @abstractmethod
+    async def get_lists(self, model, index: str, searches: list[dict],
+                        size: int,
+                        fields: list[str] = None) -> list[list] | None:
+        """
+        Абстрактный асинхронный метод для получения нескольких списков
+        данных одним запросом. Размер ограничивается для каждого списка
+        отдельно
+        :param model: тип модели, в котором возвращаются данные
+        :param index: строковое название индекса, в котором выполняется поиск
+        :param searches: список словарей с параметрами поиска, по одному на
+        список
+        :param size: количество элементов в каждом списке
+        :param fields: список полей документа, которые нужно получить из
+        хранилища. По умолчанию - все поля
+        :return: списки объектов типа model в порядке searches
+        """
+        ...
+
+    @abstractmethod
+    async def get_page(self, model, index: str, sort: str, search: dict,
+                       size: int, cursor: str,
+                       fields: list[str] = None) \
+            -> tuple[list, str | None] | None:
+        """
+        Абстрактный асинхронный метод для постраничного обхода списка данных
+        по курсору. Стоимость получения страницы не зависит от ее номера.
+        :param model: тип модели, в котором возвращаются данные
+        :param index: строковое название индекса, в котором выполняется поиск
+        :param sort: строка с названием атрибута, по которой необходима
+        сортировка
+        :param search: словарь с параметрами для поиска, если они необходимы
+        :param size: количество элементов на странице(в списке)
+        :param cursor: курсор, полученный с предыдущей страницей, или None для
+        первой страницы
+        :param fields: список полей документа, которые нужно получить из
+        хранилища. По умолчанию - все поля
+        :return: список объектов типа model и курсор следующей страницы
+        (None, если страница последняя)
+        """
+        ...
+
+    @abstractmethod
+    async def get_aggregations(self, index: str, search: dict,
+                               aggs: dict) -> dict | None:
+        """
+        Абстрактный асинхронный метод для получения агрегаций (фасетов) по
+        документам без самих документов
+        :param index: строковое название индекса, в котором выполняется поиск
+        :param search: словарь с параметрами для поиска, если они необходимы
+        :param aggs: описание агрегаций в формате хранилища
+        :return: словарь с результатами агрегаций по их названиям
+        """
+        ...
+
+    @abstractmethod
+    def scan(self, index: str, search: dict, size: int,
+             fields: list[str] = None) -> AsyncIterator[list[dict]]:
+        """
+        Абстрактный асинхронный генератор, который обходит все документы,
+        подходящие под запрос, не ограничиваясь окном пагинации
+        :param index: строковое название индекса, в котором выполняется поиск
+        :param search: словарь с параметрами для поиска, если они необходимы
+        :param size: сколько документов получать за один запрос
+        :param fields: поля документа, которые необходимо вернуть
+        :return: пачки документов в виде словарей, как они хранятся
+        """
+        ...
+
 
 class AbstractCache(ABC):
     """
@@ -49,24 +148,84 @@ class AbstractCache(ABC):
     :get_from_cache_by_key - возвращает один экземпляр класса модели,
     по которой строятся получение из кэша по ключу
     :put_to_cache_by_id - кладет данные в кэш по id.
+    :get_from_cache_by_ids - возвращает экземпляры класса модели из кэша
+    для списка id
+    :put_to_cache_by_ids - кладет данные в кэш по id одним запросом.
     :put_to_cache_by_key - кладет данные в кэш по ключу.
+    :get_payload_by_key - возвращает готовое тело ответа из кэша по ключу.
+    :get_entry_from_cache_by_id, get_entry_from_cache_by_key,
+    get_payload_entry_by_key - то же, что методы выше, но вместе с временем,
+    оставшимся до мягкого истечения записи.
+    :put_payload_by_key - кладет готовое тело ответа в кэш по ключу.
+    :exists - проверяет, есть ли ключ в кэше.
+    :touch - продлевает время жизни записи.
+    :is_missing - проверяет, запомнено ли отсутствие данных по ключу.
+    :put_missing - запоминает отсутствие данных по ключу.
+    :get_generation - возвращает номер поколения ключей.
+    :incr_generation - увеличивает номер поколения ключей.
+    :invalidate_tags - удаляет записи, помеченные тегами.
+    :lock - берет распределенную блокировку по ключу.
+    :unlock - освобождает распределенную блокировку.
+    :is_locked - проверяет, занята ли блокировка по ключу.
     """
 
     @abstractmethod
-    async def get_from_cache_by_id(self, _id: str, model) -> Optional:
+    async def get_from_cache_by_id(self, _id: str, model,
+                                   prefix: str = '') -> Optional:
         """
         Абстрактный асинхронный метод для получения данных по id из кэша
         :param _id: строка с id, по которой выполняется поиск
         :param model: тип модели, в котором возвращаются данные
+        :param prefix: префикс ключа записи, например индекс и его поколение
         :return: объект типа, заявленного в model
         """
         ...
 
     @abstractmethod
-    async def put_to_cache_by_id(self, entity):
+    async def put_to_cache_by_id(self, entity, tags: list[str] = None,
+                                 prefix: str = ''):
         """
         Абстрактный асинхронный метод, который кладет данные в кэш по id
         :param entity: данные, которые кладем в кэш
+        :param tags: теги записи, по которым ее удаляет invalidate_tags
+        :param prefix: префикс ключа записи, например индекс и его поколение
+        """
+        ...
+
+    @abstractmethod
+    async def get_from_cache_by_ids(self,
+                                    ids: list[str],
+                                    model,
+                                    fields: list[str] = None,
+                                    prefix: str = '') -> dict:
+        """
+        Абстрактный асинхронный метод для получения данных по списку id из
+        кэша одним запросом
+        :param ids: список id, по которым выполняется поиск
+        :param model: тип модели, в котором возвращаются данные
+        :param fields: если передан, подходят и записи, сохраненные в кэш
+        только с этими полями
+        :param prefix: префикс ключей записей, например индекс и его
+        поколение
+        :return: словарь {id: объект типа model} для найденных в кэше id
+        """
+        ...
+
+    @abstractmethod
+    async def put_to_cache_by_ids(self,
+                                  entities: list,
+                                  fields: list[str] = None,
+                                  tags: list[str] = None,
+                                  prefix: str = ''):
+        """
+        Абстрактный асинхронный метод, который кладет в кэш данные по id
+        одним запросом
+        :param entities: данные, которые кладем в кэш
+        :param fields: поля, с которыми данные получены из хранилища. Записи
+        с неполным набором полей хранятся отдельно от полных
+        :param tags: по одному тегу на каждую запись, в порядке entities
+        :param prefix: префикс ключей записей, например индекс и его
+        поколение
         """
         ...
 
@@ -87,10 +246,181 @@ class AbstractCache(ABC):
     @abstractmethod
     async def put_to_cache_by_key(self,
                                   key: str = None,
-                                  entities: list = None):
+                                  entities: list = None,
+                                  tags: list[str] = None):
         """
         Абстрактный асинхронный метод, который кладет данные в кэш по ключу
         :param key: по данному ключу записываются данные в кэш
         :param entities: данные, которые кладем в кэш
+        :param tags: теги записи, по которым ее удаляет invalidate_tags
+        """
+        ...
+
+    @abstractmethod
+    async def get_payload_by_key(self, key: str) -> bytes | None:
+        """
+        Абстрактный асинхронный метод для получения из кэша готового
+        сериализованного тела ответа по ключу
+        :param key: по данному ключу получаем данные из кэша
+        :return: байты тела ответа
+        """
+        ...
+
+    @abstractmethod
+    async def put_payload_by_key(self, key: str, payload: bytes,
+                                 expire: float = None,
+                                 tags: list[str] = None):
+        """
+        Абстрактный асинхронный метод, который кладет в кэш готовое
+        сериализованное тело ответа по ключу
+        :param key: по данному ключу записываются данные в кэш
+        :param payload: байты тела ответа, уже отсортированные для ключа
+        :param expire: срок свежести записи в секундах, если он отличается
+        от общего для кэша
+        :param tags: теги записи, по которым ее удаляет invalidate_tags
+        """
+        ...
+
+    @abstractmethod
+    async def get_entry_from_cache_by_id(self, _id: str, model,
+                                         prefix: str = '') \
+            -> tuple[Optional, float]:
+        """
+        Абстрактный асинхронный метод для получения данных по id из кэша
+        вместе со свежестью записи
+        :param _id: строка с id, по которой выполняется поиск
+        :param model: тип модели, в котором возвращаются данные
+        :param prefix: префикс ключа записи, например индекс и его поколение
+        :return: объект типа, заявленного в model, и количество секунд до
+        мягкого истечения. Не больше нуля - запись устарела, но еще
+        может быть отдана, пока ее обновляют
+        """
+        ...
+
+    @abstractmethod
+    async def get_entry_from_cache_by_key(self,
+                                          model,
+                                          key: str = None,
+                                          sort: str = None) \
+            -> tuple[list | None, float]:
+        """
+        Абстрактный асинхронный метод для получения данных по ключу из кэша
+        вместе со свежестью записи
+        :param model: тип модели, в котором возвращаются данные
+        :param key: по данному ключу получаем данные из кэша
+        :param sort: строка с названием атрибута, по которой необходима
+        сортировка
+        :return: список объектов типа model и количество секунд до мягкого
+        истечения
+        """
+        ...
+
+    @abstractmethod
+    async def get_payload_entry_by_key(self, key: str) \
+            -> tuple[bytes | None, float]:
+        """
+        Абстрактный асинхронный метод для получения из кэша готового тела
+        ответа по ключу вместе со свежестью записи
+        :param key: по данному ключу получаем данные из кэша
+        :return: байты тела ответа и количество секунд до мягкого истечения
+        """
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """
+        Абстрактный асинхронный метод, который проверяет, есть ли ключ в кэше
+        :param key: ключ, который проверяем
+        """
+        ...
+
+    @abstractmethod
+    async def touch(self, key: str, expire: float):
+        """
+        Абстрактный асинхронный метод, который продлевает время жизни записи
+        кэша
+        :param key: ключ записи в кэше. Для готовых тел ответа -
+        'payload:<ключ>'
+        :param expire: новое время жизни в секундах
+        """
+        ...
+
+    @abstractmethod
+    async def is_missing(self, key: str) -> bool:
+        """
+        Абстрактный асинхронный метод, который проверяет, есть ли в кэше
+        отметка (tombstone) о том, что в хранилище нет данных по ключу
+        :param key: ключ, который проверяем
+        """
+        ...
+
+    @abstractmethod
+    async def put_missing(self, key: str, expire: float):
+        """
+        Абстрактный асинхронный метод, который кладет в кэш отметку о том,
+        что в хранилище нет данных по ключу
+        :param key: ключ, для которого нет данных
+        :param expire: время жизни отметки в секундах
+        """
+        ...
+
+    @abstractmethod
+    async def get_generation(self, name: str) -> int:
+        """
+        Абстрактный асинхронный метод, который возвращает номер поколения
+        ключей кэша
+        :param name: название поколения, например, индекса
+        :return: номер поколения, 0 если оно ни разу не увеличивалось
+        """
+        ...
+
+    @abstractmethod
+    async def incr_generation(self, name: str) -> int:
+        """
+        Абстрактный асинхронный метод, который увеличивает номер поколения
+        ключей кэша. Ключи прежнего поколения больше не читаются и истекают
+        сами
+        :param name: название поколения, например, индекса
+        :return: новый номер поколения
+        """
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: list[str]) -> list[str]:
+        """
+        Абстрактный асинхронный метод, который удаляет все записи кэша,
+        помеченные хотя бы одним из тегов, и отметки об отсутствии данных
+        с такими же ключами
+        :param tags: теги, обычно '<индекс>:<id сущности>'
+        :return: удаленные ключи
+        """
+        ...
+
+    @abstractmethod
+    async def lock(self, key: str, timeout: float = None) -> Optional:
+        """
+        Абстрактный асинхронный метод, который берет блокировку по ключу без
+        ожидания
+        :param key: ключ, для которого берется блокировка
+        :param timeout: через сколько секунд блокировка снимается сама.
+        По умолчанию - CACHE_LOCK_TIMEOUT
+        :return: объект блокировки или None, если блокировка уже занята
+        """
+        ...
+
+    @abstractmethod
+    async def unlock(self, lock):
+        """
+        Абстрактный асинхронный метод, который освобождает блокировку
+        :param lock: объект блокировки, полученный из lock
+        """
+        ...
+
+    @abstractmethod
+    async def is_locked(self, key: str) -> bool:
+        """
+        Абстрактный асинхронный метод, который проверяет, занята ли
+        блокировка по ключу
+        :param key: ключ, переданный в lock
         """
         ...
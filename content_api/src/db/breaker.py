@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from time import monotonic, perf_counter
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from elasticsearch import TransportError
+
+from core.metrics import STORAGE_LATENCY
+from db import AbstractStorage, StorageUnavailableError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+# Ошибки, говорящие о недоступности хранилища. ConnectionError и
+# ConnectionTimeout - подклассы TransportError. Остальные ошибки, например
+# некорректный документ, не размыкают цепь и пробрасываются как есть
+STORAGE_ERRORS = (TransportError, asyncio.TimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи. После failure_threshold ошибок подряд цепь
+    размыкается, и запросы к хранилищу сразу отклоняются. Через
+    reset_timeout секунд пропускается не больше half_open_max_calls
+    пробных запросов: успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self,
+                 failure_threshold: int,
+                 reset_timeout: float,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                return False
+            self._probes += 1
+        return True
+
+    def release(self):
+        """
+        Освобождает место пробного запроса, который завершился без
+        success и failure: был отменен или упал не из-за хранилища
+        """
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def success(self):
+        if self.state != CLOSED:
+            logging.info('Хранилище снова доступно, цепь замкнута')
+        self.state = CLOSED
+        self._failures = 0
+
+    def failure(self):
+        self._failures += 1
+        if self.state == HALF_OPEN or \
+                self._failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logging.error('Хранилище недоступно, цепь разомкнута')
+            self.state = OPEN
+            self._opened_at = monotonic()
+
+
+class BreakerStorage(AbstractStorage):
+    """
+    Хранилище с размыкателем цепи и ограничением времени каждого запроса.
+    Ошибки и таймауты хранилища (STORAGE_ERRORS) превращаются в
+    StorageUnavailableError, как и запросы, отклоненные разомкнутой цепью.
+    Время каждого запроса попадает в метрику STORAGE_LATENCY.
+    """
+
+    def __init__(self,
+                 storage: AbstractStorage,
+                 breaker: CircuitBreaker,
+                 timeout: float):
+        self.storage = storage
+        self.breaker = breaker
+        self.timeout = timeout
+
+    async def _call(self,
+                    operation: str,
+                    index: str,
+                    call: Callable[[], Awaitable]) -> Optional:
+        if not self.breaker.allow():
+            raise StorageUnavailableError('Circuit is open')
+        probe = self.breaker.state == HALF_OPEN
+        started = perf_counter()
+        try:
+            res = await asyncio.wait_for(call(), self.timeout)
+        except STORAGE_ERRORS as err:
+            self.breaker.failure()
+            raise StorageUnavailableError(str(err)) from err
+        finally:
+            STORAGE_LATENCY.labels(index, operation).observe(
+                perf_counter() - started)
+            if probe:
+                self.breaker.release()
+        self.breaker.success()
+        return res
+
+    async def get_by_id(self, _id: str, index: str, model) -> Optional:
+        return await self._call(
+            'get_by_id', index,
+            lambda: self.storage.get_by_id(_id, index, model))
+
+    async def get_by_ids(self, ids: list[str], index: str, model,
+                         fields: list[str] = None) -> list:
+        return await self._call(
+            'get_by_ids', index,
+            lambda: self.storage.get_by_ids(ids, index, model, fields))
+
+    async def get_list(self, model, index: str, sort: str, search: dict,
+                       page: int, size: int,
+                       fields: list[str] = None) -> list | None:
+        return await self._call(
+            'get_list', index,
+            lambda: self.storage.get_list(model, index, sort, search, page,
+                                          size, fields))
+
+    async def get_lists(self, model, index: str, searches: list[dict],
+                        size: int,
+                        fields: list[str] = None) -> list[list] | None:
+        return await self._call(
+            'get_lists', index,
+            lambda: self.storage.get_lists(model, index, searches, size,
+                                           fields))
+
+    async def get_page(self, model, index: str, sort: str, search: dict,
+                       size: int, cursor: str,
+                       fields: list[str] = None) \
+            -> tuple[list, str | None] | None:
+        return await self._call(
+            'get_page', index,
+            lambda: self.storage.get_page(model, index, sort, search, size,
+                                          cursor, fields))
+
+    async def get_aggregations(self, index: str, search: dict,
+                               aggs: dict) -> dict | None:
+        return await self._call(
+            'get_aggregations', index,
+            lambda: self.storage.get_aggregations(index, search, aggs))
+
+    async def scan(self, index: str, search: dict, size: int,
+                   fields: list[str] = None) -> AsyncIterator[list[dict]]:
+        # Размыкатель и таймаут применяются к каждой пачке отдельно: обход
+        # большого индекса может длиться сколько угодно
+        pages = self.storage.scan(index, search, size, fields)
+        try:
+            while page := await self._call('scan', index,
+                                           lambda: anext(pages, None)):
+                yield page
+        finally:
+            await pages.aclose()
+
+    async def close(self):
+        await self.storage.close()
@@ -0,0 +1,106 @@
+import logging
+import zlib
+from time import perf_counter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+from core.config import settings
+from models.model import Model
+
+# Первый байт сжатой записи определяет формат. Несжатые записи - это json,
+# они начинаются с '{' или '[' и хранятся без заголовка, поэтому записи,
+# положенные в кэш до включения сжатия, читаются как раньше
+HEADERS = {'zlib': b'\x01', 'zstd': b'\x02', 'lz4': b'\x03'}
+
+
+class CodecStats(Model):
+    encoded: int = 0
+    compressed: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    encode_seconds: float = 0
+    decoded: int = 0
+    decode_seconds: float = 0
+
+
+class Codec:
+    """
+    Сжатие записей кэша. Записи короче threshold байт не сжимаются: выигрыш
+    по памяти на них меньше, чем затраты на сжатие.
+    Читаются записи любого формата, независимо от настроенного.
+    """
+
+    def __init__(self, name: str, threshold: int, level: int):
+        if name == 'zstd' and not zstandard or name == 'lz4' and not lz4:
+            logging.warning(f'Библиотека для сжатия {name} не установлена, '
+                            f'используется zlib')
+            name = 'zlib'
+        self.name = name
+        self.threshold = threshold
+        self.level = level
+        self.stats = CodecStats()
+        if name == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level)
+
+    @property
+    def ratio(self) -> float:
+        # Во сколько раз сжатые записи меньше исходных
+        if not self.stats.stored_bytes:
+            return 1.0
+        return self.stats.raw_bytes / self.stats.stored_bytes
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.name == 'zstd':
+            return self._compressor.compress(data)
+        if self.name == 'lz4':
+            return lz4.frame.compress(data, compression_level=self.level)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, header: bytes, data: bytes) -> bytes:
+        if header == HEADERS['zstd']:
+            return zstandard.ZstdDecompressor().decompress(data)
+        if header == HEADERS['lz4']:
+            return lz4.frame.decompress(data)
+        return zlib.decompress(data)
+
+    def encode(self, data: str | bytes) -> bytes:
+        if isinstance(data, str):
+            data = data.encode()
+        if self.name not in HEADERS or len(data) < self.threshold:
+            return data
+
+        started = perf_counter()
+        res = HEADERS[self.name] + self._compress(data)
+        if len(res) >= len(data):
+            # Несжимаемые данные храним как есть
+            res = data
+        self.stats.encode_seconds += perf_counter() - started
+        self.stats.encoded += 1
+        self.stats.compressed += res is not data
+        self.stats.raw_bytes += len(data)
+        self.stats.stored_bytes += len(res)
+        return res
+
+    def decode(self, data: bytes) -> bytes:
+        header = data[:1]
+        if header not in HEADERS.values():
+            return data
+
+        started = perf_counter()
+        res = self._decompress(header, data[1:])
+        self.stats.decode_seconds += perf_counter() - started
+        self.stats.decoded += 1
+        return res
+
+
+codec = Codec(settings.cache_compression,
+              settings.cache_compression_threshold,
+              settings.cache_compression_level)
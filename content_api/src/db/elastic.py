@@ -1,9 +1,44 @@
-from typing import Optional
-from elasticsearch import AsyncElasticsearch, NotFoundError, RequestError
+import binascii
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import AsyncIterator, Optional
+
+import orjson
+from elasticsearch import AsyncElasticsearch, NotFoundError, RequestError, \
+    TransportError
 
 from db import AbstractStorage
 
 ES_MAX_SIZE = 50
+# index.max_result_window по умолчанию
+ES_MAX_RESULT_WINDOW = 10000
+# Сколько живет point in time между запросами страниц
+PIT_KEEP_ALIVE = '1m'
+
+
+def _get_sorting(sort: str = None) -> list | None:
+    if not sort:
+        return None
+    try:
+        order = 'desc' if sort.startswith('-') else 'asc'
+        sort = sort[1:] if sort.startswith('-') else sort
+        return [{sort: {'order': order}}]
+    except AttributeError:
+        return None
+
+
+def _encode_cursor(pit_id: str, search_after: list) -> str:
+    return urlsafe_b64encode(
+        orjson.dumps({'pit': pit_id, 'after': search_after})).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, list] | None:
+    try:
+        state = orjson.loads(urlsafe_b64decode(cursor.encode()))
+        return state['pit'], state['after']
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError,
+            ValueError):
+        return None
 
 
 class Elastic(AbstractStorage):
@@ -17,22 +52,29 @@ class Elastic(AbstractStorage):
             return None
         return model(**doc['_source'])
 
+    async def get_by_ids(self,
+                         ids: list[str],
+                         index: str,
+                         model,
+                         fields: list[str] = None) -> list:
+        try:
+            docs = await self.session.mget(index=index,
+                                           body={'ids': ids},
+                                           _source_includes=fields)
+        except NotFoundError:
+            return []
+        return [model(**doc['_source'])
+                for doc in docs['docs'] if doc.get('found')]
+
     async def get_list(self,
                        model,
                        index: str,
                        sort: str = None,
                        search: dict = None,
                        page: int = None,
-                       size: int = None) -> list | None:
-        if sort:
-            try:
-                order = 'desc' if sort.startswith('-') else 'asc'
-                sort = sort[1:] if sort.startswith('-') else sort
-                sorting = [{sort: {'order': order}}]
-            except AttributeError:
-                sorting = None
-        else:
-            sorting = None
+                       size: int = None,
+                       fields: list[str] = None) -> list | None:
+        sorting = _get_sorting(sort)
 
         if page and size:
             offset = (page * size) - size
@@ -51,20 +93,160 @@ class Elastic(AbstractStorage):
                 query=search,
                 size=size,
                 sort=sorting,
-                from_=offset
+                from_=offset,
+                _source_includes=fields
             )
         except (NotFoundError, RequestError):
             return None
 
         return [model(**doc['_source']) for doc in docs['hits']['hits']]
 
+    async def get_lists(self,
+                        model,
+                        index: str,
+                        searches: list[dict],
+                        size: int = None,
+                        fields: list[str] = None) -> list[list] | None:
+        body = []
+        for search in searches:
+            body += [{'index': index},
+                     {'query': search,
+                      'size': size or ES_MAX_SIZE,
+                      '_source': fields or True}]
+        try:
+            docs = await self.session.msearch(body=body)
+        except (NotFoundError, RequestError):
+            return None
+
+        for res in docs['responses']:
+            if 'error' in res:
+                # Без ответа на один из запросов результат неполон, и его
+                # нельзя кэшировать как пустой
+                raise TransportError(res.get('status', 'N/A'),
+                                     res['error'].get('type'),
+                                     res['error'])
+        return [[model(**doc['_source']) for doc in res['hits']['hits']]
+                for res in docs['responses']]
+
+    async def get_page(self,
+                       model,
+                       index: str,
+                       sort: str = None,
+                       search: dict = None,
+                       size: int = None,
+                       cursor: str = None,
+                       fields: list[str] = None) \
+            -> tuple[list, str | None] | None:
+        size = size or ES_MAX_SIZE
+        # _shard_doc - неявный уникальный ключ документа в point in time,
+        # нужен, чтобы search_after не пропускал документы с равными
+        # значениями сортировки
+        sorting = (_get_sorting(sort) or ['_score']) + \
+            [{'_shard_doc': 'asc'}]
+        params = {}
+        close = False
+
+        try:
+            if cursor:
+                state = _decode_cursor(cursor)
+                if not state:
+                    return None
+                pit_id, params['search_after'] = state
+            else:
+                pit = await self.session.open_point_in_time(
+                    index=index, keep_alive=PIT_KEEP_ALIVE)
+                pit_id = pit['id']
+                # Point in time, открытый для неполученной страницы, никому
+                # не достанется
+                close = True
+
+            # Лишний документ показывает, есть ли следующая страница: курсор
+            # последней полной страницы вел бы к пустому ответу
+            docs = await self.session.search(
+                query=search,
+                size=size + 1,
+                sort=sorting,
+                pit={'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE},
+                _source_includes=fields,
+                **params
+            )
+            pit_id = docs.get('pit_id', pit_id)
+            # Последняя страница - point in time больше не нужен
+            close = last = len(docs['hits']['hits']) <= size
+        except (NotFoundError, RequestError):
+            # Point in time истек или запрос некорректен
+            return None
+        finally:
+            if close:
+                await self._close_pit(pit_id)
+
+        hits = docs['hits']['hits'][:size]
+        next_cursor = None if last else _encode_cursor(pit_id,
+                                                       hits[-1]['sort'])
+
+        return [model(**doc['_source']) for doc in hits], next_cursor
+
+    async def _close_pit(self, pit_id: str):
+        try:
+            await self.session.close_point_in_time(body={'id': pit_id})
+        except TransportError as err:
+            # Point in time мог уже истечь. Полученная страница от этого не
+            # становится ошибкой
+            logging.warning(f'Не удалось закрыть point in time: {err}')
+
+    async def get_aggregations(self,
+                               index: str,
+                               search: dict = None,
+                               aggs: dict = None) -> dict | None:
+        try:
+            docs = await self.session.search(index=index,
+                                             query=search,
+                                             size=0,
+                                             aggs=aggs)
+        except (NotFoundError, RequestError):
+            return None
+
+        return docs['aggregations']
+
+    async def scan(self, index: str, search: dict, size: int,
+                   fields: list[str] = None) -> AsyncIterator[list[dict]]:
+        # Point in time дает согласованный снимок индекса на весь обход,
+        # а search_after по _shard_doc - самую дешевую сортировку
+        try:
+            pit = await self.session.open_point_in_time(
+                index=index, keep_alive=PIT_KEEP_ALIVE)
+        except NotFoundError:
+            return
+        pit_id = pit['id']
+        params = {}
+        try:
+            while True:
+                docs = await self.session.search(
+                    query=search,
+                    size=size,
+                    sort=[{'_shard_doc': 'asc'}],
+                    pit={'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE},
+                    _source_includes=fields,
+                    **params
+                )
+                hits = docs['hits']['hits']
+                pit_id = docs.get('pit_id', pit_id)
+                if hits:
+                    yield [hit['_source'] for hit in hits]
+                if len(hits) < size:
+                    break
+                params['search_after'] = hits[-1]['sort']
+        finally:
+            await self._close_pit(pit_id)
+
     async def close(self):
         ...
 
 
-es: Elastic | None = None
+# Может быть обернут размыкателем цепи db.breaker.BreakerStorage
+es: AbstractStorage | None = None
 
 
 # Функция понадобится при внедрении зависимостей
-async def get_elastic() -> Elastic:
+async def get_elastic() -> AbstractStorage:
     return es
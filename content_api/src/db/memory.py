@@ -0,0 +1,304 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional
+from uuid import uuid4
+
+from redis.exceptions import ConnectionError
+
+from core.config import settings
+from db import AbstractCache
+from db.redis import Redis
+
+INVALIDATE_CHANNEL = 'cache:invalidate'
+
+
+def _sizeof(value) -> int:
+    # Размер оцениваем по длине json-представления: грубо, но считается
+    # один раз при записи в кэш
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, int):
+        return 8
+    if isinstance(value, list):
+        return sum(len(entity.json()) for entity in value)
+    return len(value.json())
+
+
+class MemoryCache(AbstractCache):
+    """
+    Локальный кэш процесса (L1) перед Redis (L2).
+    Хранит уже десериализованные объекты моделей с собственным TTL,
+    вытесняет давно не использованные записи (LRU) при превышении
+    количества записей или объема памяти.
+    Каждая запись в Redis публикуется в канал INVALIDATE_CHANNEL, чтобы
+    остальные воркеры удалили свою копию ключа.
+    """
+
+    def __init__(self,
+                 cache: Redis,
+                 expire: float,
+                 max_items: int,
+                 max_bytes: int):
+        self.cache = cache
+        self.expire = expire
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        # {ключ: (время удаления, время устаревания, размер, значение)}
+        self._data: OrderedDict[str, tuple[float, float, int, object]] = \
+            OrderedDict()
+        self._bytes = 0
+        self._worker_id = uuid4().hex
+        self._listener: asyncio.Task | None = None
+
+    def _get_entry(self, key: str) -> tuple[Optional, float]:
+        item = self._data.get(key)
+        if not item:
+            return None, 0
+        expires_at, stale_at, _, value = item
+        now = monotonic()
+        if expires_at < now:
+            self._delete(key)
+            return None, 0
+        self._data.move_to_end(key)
+        return value, stale_at - now
+
+    def _get(self, key: str) -> Optional:
+        return self._get_entry(key)[0]
+
+    def _set(self, key: str, value, fresh_for: float = None):
+        """
+        :param fresh_for: через сколько секунд запись устареет. По умолчанию
+        запись только что получена из хранилища и свежа на весь срок кэша
+        """
+        self._delete(key)
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        if fresh_for is None:
+            fresh_for = settings.cache_expire_in_seconds
+        now = monotonic()
+        self._data[key] = (now + self.expire, now + fresh_for, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_items or \
+                self._bytes > self.max_bytes:
+            _, (_, _, evicted, _) = self._data.popitem(last=False)
+            self._bytes -= evicted
+
+    def _delete(self, key: str):
+        item = self._data.pop(key, None)
+        if item:
+            self._bytes -= item[2]
+
+    async def _publish(self, *keys: str):
+        # Ключи одной записи передаем одним сообщением, по строке на ключ
+        await self.cache.publish(INVALIDATE_CHANNEL,
+                                 f'{self._worker_id}:' + '\n'.join(keys))
+
+    async def get_from_cache_by_id(self, _id: str, model,
+                                   prefix: str = '') -> Optional:
+        entity = self._get(f'{prefix}{_id}')
+        if entity is None:
+            entity = await self.cache.get_from_cache_by_id(_id, model,
+                                                           prefix)
+            if entity:
+                self._set(f'{prefix}{_id}', entity)
+        return entity
+
+    async def put_to_cache_by_id(self, entity, tags: list[str] = None,
+                                 prefix: str = ''):
+        await self.cache.put_to_cache_by_id(entity, tags, prefix)
+        self._set(f'{prefix}{entity.id}', entity)
+        await self._publish(f'{prefix}{entity.id}')
+
+    async def get_from_cache_by_ids(self,
+                                    ids: list[str],
+                                    model,
+                                    fields: list[str] = None,
+                                    prefix: str = '') -> dict:
+        # Локально храним только полные записи по id
+        res = {}
+        for _id in ids:
+            entity = self._get(f'{prefix}{_id}')
+            if entity is not None:
+                res[_id] = entity
+        missed = [_id for _id in ids if _id not in res]
+        if missed:
+            found = await self.cache.get_from_cache_by_ids(missed, model,
+                                                           fields, prefix)
+            res.update(found)
+            if not fields:
+                for _id, entity in found.items():
+                    self._set(f'{prefix}{_id}', entity)
+        return res
+
+    async def put_to_cache_by_ids(self,
+                                  entities: list,
+                                  fields: list[str] = None,
+                                  tags: list[str] = None,
+                                  prefix: str = ''):
+        await self.cache.put_to_cache_by_ids(entities, fields, tags, prefix)
+        if not fields and entities:
+            for entity in entities:
+                self._set(f'{prefix}{entity.id}', entity)
+            await self._publish(*[f'{prefix}{entity.id}'
+                                  for entity in entities])
+
+    async def get_from_cache_by_key(self,
+                                    model,
+                                    key: str = None,
+                                    sort: str = None) -> list | None:
+        # Параметр sort всегда входит в ключ списка, поэтому отдельно его
+        # не учитываем
+        entities = self._get(key)
+        if entities is None:
+            entities = await self.cache.get_from_cache_by_key(model, key,
+                                                              sort)
+            if entities:
+                self._set(key, entities)
+        return entities
+
+    async def put_to_cache_by_key(self,
+                                  key: str = None,
+                                  entities: list = None,
+                                  tags: list[str] = None):
+        await self.cache.put_to_cache_by_key(key, entities, tags)
+        self._set(key, entities)
+        await self._publish(key)
+
+    async def get_payload_by_key(self, key: str) -> bytes | None:
+        payload = self._get(f'payload:{key}')
+        if payload is None:
+            payload = await self.cache.get_payload_by_key(key)
+            if payload:
+                self._set(f'payload:{key}', payload)
+        return payload
+
+    async def put_payload_by_key(self, key: str, payload: bytes,
+                                 expire: float = None,
+                                 tags: list[str] = None):
+        await self.cache.put_payload_by_key(key, payload, expire, tags)
+        self._set(f'payload:{key}', payload, expire)
+        await self._publish(f'payload:{key}')
+
+    async def get_entry_from_cache_by_id(self, _id: str, model,
+                                         prefix: str = '') \
+            -> tuple[Optional, float]:
+        entity, fresh_for = self._get_entry(f'{prefix}{_id}')
+        if entity is None:
+            entity, fresh_for = \
+                await self.cache.get_entry_from_cache_by_id(_id, model,
+                                                            prefix)
+            if entity:
+                self._set(f'{prefix}{_id}', entity, fresh_for)
+        return entity, fresh_for
+
+    async def get_entry_from_cache_by_key(self,
+                                          model,
+                                          key: str = None,
+                                          sort: str = None) \
+            -> tuple[list | None, float]:
+        entities, fresh_for = self._get_entry(key)
+        if entities is None:
+            entities, fresh_for = \
+                await self.cache.get_entry_from_cache_by_key(model, key, sort)
+            if entities:
+                self._set(key, entities, fresh_for)
+        return entities, fresh_for
+
+    async def get_payload_entry_by_key(self, key: str) \
+            -> tuple[bytes | None, float]:
+        payload, fresh_for = self._get_entry(f'payload:{key}')
+        if payload is None:
+            payload, fresh_for = \
+                await self.cache.get_payload_entry_by_key(key)
+            if payload:
+                self._set(f'payload:{key}', payload, fresh_for)
+        return payload, fresh_for
+
+    async def exists(self, key: str) -> bool:
+        return await self.cache.exists(key)
+
+    async def touch(self, key: str, expire: float):
+        await self.cache.touch(key, expire)
+
+    async def is_missing(self, key: str) -> bool:
+        return await self.cache.is_missing(key)
+
+    async def put_missing(self, key: str, expire: float):
+        await self.cache.put_missing(key, expire)
+
+    async def get_generation(self, name: str) -> int:
+        # Поколение читается при построении каждого ключа списка, поэтому
+        # тоже хранится локально и сбрасывается через канал инвалидации
+        generation = self._get(f'generation:{name}')
+        if generation is None:
+            generation = await self.cache.get_generation(name)
+            self._set(f'generation:{name}', generation)
+        return generation
+
+    async def incr_generation(self, name: str) -> int:
+        generation = await self.cache.incr_generation(name)
+        self._set(f'generation:{name}', generation)
+        await self._publish(f'generation:{name}')
+        return generation
+
+    async def invalidate_tags(self, tags: list[str]) -> list[str]:
+        keys = await self.cache.invalidate_tags(tags)
+        if keys:
+            for key in keys:
+                self._delete(key)
+            await self._publish(*keys)
+        return keys
+
+    async def lock(self, key: str, timeout: float = None) -> Optional:
+        return await self.cache.lock(key, timeout)
+
+    async def unlock(self, lock):
+        await self.cache.unlock(lock)
+
+    async def is_locked(self, key: str) -> bool:
+        return await self.cache.is_locked(key)
+
+    async def subscribe(self):
+        """
+        Запускает фоновую задачу, которая слушает канал инвалидации
+        """
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            pubsub = self.cache.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                async for message in pubsub.listen():
+                    self._invalidate(message['data'])
+            except Exception as err:
+                if isinstance(err, ConnectionError):
+                    logging.error('Подписка на инвалидацию кэша прервана')
+                else:
+                    logging.exception('Ошибка подписки на инвалидацию кэша')
+                # Пока подписки не было, могли пропустить сообщения
+                self._data.clear()
+                self._bytes = 0
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    def _invalidate(self, data: bytes):
+        try:
+            worker_id, keys = data.decode().split(':', 1)
+        except (AttributeError, UnicodeDecodeError, ValueError):
+            # Чужое сообщение в канале не должно останавливать подписку
+            logging.warning(f'Некорректное сообщение в канале '
+                            f'{INVALIDATE_CHANNEL}: {data!r}')
+            return
+        if worker_id != self._worker_id:
+            for key in keys.split('\n'):
+                self._delete(key)
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        await self.cache.close()
@@ -1,28 +1,126 @@
-import json
-
+import math
+from operator import attrgetter
+from time import time
 from typing import Optional
 from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import LockError
 
 from core.config import settings
+from core.metrics import timed_cache
 from db import AbstractCache
+from db.codec import codec
+
+# Отметки об отсутствии данных хранятся в одном sorted set с временем
+# истечения в качестве score: так их количество можно ограничить
+MISSING_KEY = 'missing'
+# Тег - sorted set ключей записей с временем их истечения в качестве score
+TAG_PREFIX = 'tag:'
+
+
+def _projection_key(_id: str, fields: list[str]) -> str:
+    # Записи с неполным набором полей не должны попадать в ответы,
+    # ожидающие полную запись по id
+    return f'{_id}:{",".join(sorted(fields))}'
+
+
+def _expire(expire: float = None) -> int:
+    # Запись живет дольше срока свежести на время, в течение которого ее
+    # можно отдавать устаревшей, пока она обновляется в фоне
+    return math.ceil(expire or settings.cache_expire_in_seconds) + \
+        settings.cache_stale_in_seconds
+
+
+def _fresh_for(pttl: int) -> float:
+    # PTTL возвращает -1 для ключа без срока жизни
+    if pttl < 0:
+        return math.inf
+    return pttl / 1000 - settings.cache_stale_in_seconds
+
+
+def _tag(pipe, key: str, tags: list[str] | None, expire: int):
+    # Истекшие записи вычищаются из тега при каждой записи, а сам тег живет
+    # не меньше самой долгой из своих записей
+    now = time()
+    for tag in tags or []:
+        name = f'{TAG_PREFIX}{tag}'
+        pipe.zadd(name, {key: now + expire})
+        pipe.zremrangebyscore(name, '-inf', now)
+        pipe.expire(name, expire, nx=True)
+        pipe.expire(name, expire, gt=True)
+
+
+def _parse_list(data: dict, model, sort: str = None) -> list:
+    res = [model.parse_raw(codec.decode(i)) for i in data.values()]
+    if sort:
+        # Раз в сортировке есть знак минус, то его нужно убрать,
+        # чтобы получить название поля, по которому идёт сортировка.
+        # Используем срез, убирая нулевой элемент
+        reverse = sort[0] == '-'
+        field = sort[1:] if reverse else sort
+        res.sort(key=attrgetter(field), reverse=reverse)
+    return res
 
 
 class Redis(AbstractCache):
     def __init__(self, **params):
         self.session = AsyncRedis(**params)
 
-    async def get_from_cache_by_id(self, _id: str, model) -> Optional:
-        data = await self.session.get(_id)
+    @timed_cache
+    async def get_from_cache_by_id(self, _id: str, model,
+                                   prefix: str = '') -> Optional:
+        data = await self.session.get(f'{prefix}{_id}')
         if not data:
             return None
 
-        res = model.parse_raw(data)
+        res = model.parse_raw(codec.decode(data))
+        return res
+
+    @timed_cache
+    async def put_to_cache_by_id(self, entity, tags: list[str] = None,
+                                 prefix: str = ''):
+        key = f'{prefix}{entity.id}'
+        async with self.session.pipeline(transaction=False) as pipe:
+            pipe.set(key, codec.encode(entity.json()), _expire())
+            _tag(pipe, key, tags, _expire())
+            await pipe.execute()
+
+    @timed_cache
+    async def get_from_cache_by_ids(self,
+                                    ids: list[str],
+                                    model,
+                                    fields: list[str] = None,
+                                    prefix: str = '') -> dict:
+        if not ids:
+            return {}
+        keys = [f'{prefix}{_id}' for _id in ids]
+        if fields:
+            keys += [_projection_key(key, fields) for key in keys]
+        data = await self.session.mget(keys)
+
+        res = {}
+        # Полные записи идут в начале, поэтому имеют приоритет
+        for _id, value in zip(ids * (len(keys) // len(ids)), data):
+            if value and _id not in res:
+                res[_id] = model.parse_raw(codec.decode(value))
         return res
 
-    async def put_to_cache_by_id(self, entity):
-        await self.session.set(entity.id, entity.json(),
-                               settings.cache_expire_in_seconds)
+    @timed_cache
+    async def put_to_cache_by_ids(self,
+                                  entities: list,
+                                  fields: list[str] = None,
+                                  tags: list[str] = None,
+                                  prefix: str = ''):
+        async with self.session.pipeline(transaction=False) as pipe:
+            for i, entity in enumerate(entities):
+                key = f'{prefix}{entity.id}'
+                if fields:
+                    key = _projection_key(key, fields)
+                pipe.set(key, codec.encode(entity.json()), _expire())
+                if tags:
+                    _tag(pipe, key, [tags[i]], _expire())
+            await pipe.execute()
 
+    @timed_cache
     async def get_from_cache_by_key(self,
                                     model,
                                     key: str = None,
@@ -31,35 +129,161 @@ class Redis(AbstractCache):
         if not data:
             return None
 
-        res = data.values()
-        if sort:
-            if sort[0] == '-':
-                # Раз в сортировке есть знак минус, то его нужно убрать,
-                # чтобы получить название поля, по которому идёт сортировка.
-                # Используем срез, убирая нулевой элемент
-                res = sorted(res, key=lambda x: json.loads(x)[sort[1:]],
-                             reverse=True)
-            else:
-                res = sorted(res, key=lambda x: json.loads(x)[sort])
-        return [model.parse_raw(i) for i in res]
+        return _parse_list(data, model, sort)
 
+    @timed_cache
     async def put_to_cache_by_key(self,
                                   key: str = None,
-                                  entities: list = None):
+                                  entities: list = None,
+                                  tags: list[str] = None):
         entities_dict: dict = \
-            {item: entity.json() for item, entity in enumerate(entities)}
-        await self.session.hset(name=key,
-                                mapping=entities_dict)
-        await self.session.expire(name=key,
-                                  time=settings.cache_expire_in_seconds)
+            {item: codec.encode(entity.json())
+             for item, entity in enumerate(entities)}
+        async with self.session.pipeline(transaction=False) as pipe:
+            pipe.hset(name=key, mapping=entities_dict)
+            pipe.expire(name=key, time=_expire())
+            _tag(pipe, key, tags, _expire())
+            await pipe.execute()
+
+    @timed_cache
+    async def get_payload_by_key(self, key: str) -> bytes | None:
+        data = await self.session.get(f'payload:{key}')
+        return codec.decode(data) if data else None
+
+    @timed_cache
+    async def put_payload_by_key(self, key: str, payload: bytes,
+                                 expire: float = None,
+                                 tags: list[str] = None):
+        async with self.session.pipeline(transaction=False) as pipe:
+            pipe.set(f'payload:{key}', codec.encode(payload),
+                     _expire(expire))
+            _tag(pipe, f'payload:{key}', tags, _expire(expire))
+            await pipe.execute()
+
+    async def _get_with_ttl(self, command: str, key: str) -> tuple:
+        # Значение и оставшееся время жизни за один запрос к Redis
+        async with self.session.pipeline(transaction=False) as pipe:
+            getattr(pipe, command)(key)
+            pipe.pttl(key)
+            return await pipe.execute()
+
+    @timed_cache
+    async def get_entry_from_cache_by_id(self, _id: str, model,
+                                         prefix: str = '') \
+            -> tuple[Optional, float]:
+        data, pttl = await self._get_with_ttl('get', f'{prefix}{_id}')
+        if not data:
+            return None, 0
+        return model.parse_raw(codec.decode(data)), _fresh_for(pttl)
+
+    @timed_cache
+    async def get_entry_from_cache_by_key(self,
+                                          model,
+                                          key: str = None,
+                                          sort: str = None) \
+            -> tuple[list | None, float]:
+        data, pttl = await self._get_with_ttl('hgetall', key)
+        if not data:
+            return None, 0
+        return _parse_list(data, model, sort), _fresh_for(pttl)
+
+    @timed_cache
+    async def get_payload_entry_by_key(self, key: str) \
+            -> tuple[bytes | None, float]:
+        data, pttl = await self._get_with_ttl('get', f'payload:{key}')
+        if not data:
+            return None, 0
+        return codec.decode(data), _fresh_for(pttl)
+
+    @timed_cache
+    async def exists(self, key: str) -> bool:
+        return bool(await self.session.exists(key))
+
+    @timed_cache
+    async def touch(self, key: str, expire: float):
+        await self.session.expire(key, math.ceil(expire))
+
+    @timed_cache
+    async def is_missing(self, key: str) -> bool:
+        expires_at = await self.session.zscore(MISSING_KEY, key)
+        return expires_at is not None and expires_at > time()
+
+    @timed_cache
+    async def put_missing(self, key: str, expire: float):
+        now = time()
+        async with self.session.pipeline(transaction=False) as pipe:
+            pipe.zadd(MISSING_KEY, {key: now + expire})
+            # Убираем истекшие отметки, а сверх лимита - ближайшие к
+            # истечению
+            pipe.zremrangebyscore(MISSING_KEY, '-inf', now)
+            pipe.zremrangebyrank(MISSING_KEY, 0,
+                                 -settings.negative_cache_max_items - 1)
+            await pipe.execute()
+
+    @timed_cache
+    async def get_generation(self, name: str) -> int:
+        return int(await self.session.get(f'generation:{name}') or 0)
+
+    @timed_cache
+    async def incr_generation(self, name: str) -> int:
+        return await self.session.incr(f'generation:{name}')
+
+    @timed_cache
+    async def invalidate_tags(self, tags: list[str]) -> list[str]:
+        if not tags:
+            return []
+        names = [f'{TAG_PREFIX}{tag}' for tag in tags]
+        async with self.session.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.zrangebyscore(name, time(), '+inf')
+            members = await pipe.execute()
+
+        keys = list(dict.fromkeys(key.decode() for keys in members
+                                  for key in keys))
+        async with self.session.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys, *names)
+            # Сущность могла появиться там, где раньше ее не было
+            pipe.zrem(MISSING_KEY, *tags)
+            await pipe.execute()
+        return keys
+
+    @timed_cache
+    async def lock(self, key: str, timeout: float = None) -> Optional:
+        lock = self.session.lock(
+            f'lock:{key}',
+            timeout=timeout or settings.cache_lock_timeout,
+            blocking=False)
+        if await lock.acquire():
+            return lock
+        return None
+
+    @timed_cache
+    async def unlock(self, lock):
+        try:
+            await lock.release()
+        except LockError:
+            # Блокировка истекла по таймауту или уже занята другим воркером
+            pass
+
+    @timed_cache
+    async def is_locked(self, key: str) -> bool:
+        return bool(await self.session.exists(f'lock:{key}'))
+
+    @timed_cache
+    async def publish(self, channel: str, message: str):
+        await self.session.publish(channel, message)
+
+    def pubsub(self):
+        return self.session.pubsub(ignore_subscribe_messages=True)
 
     async def close(self):
         ...
 
 
-redis: Redis | None = None
+# Может быть обернут локальным кэшем db.memory.MemoryCache
+redis: AbstractCache | None = None
 
 
 # Функция понадобится при внедрении зависимостей
-async def get_redis() -> Redis:
+async def get_redis() -> AbstractCache:
     return redis
@@ -10,5 +10,7 @@ done
 echo "volume $APP_HOME/tests/ created"
 
 pip install -r "$APP_HOME"/tests/functional/requirements.txt &&
+pip install -r "$APP_HOME"/tests/unit/requirements.txt &&
+pytest -s -v "$APP_HOME"/tests/unit &&
 python3 "$APP_HOME"/tests/functional/waiters.py &&
 pytest -s -v "$APP_HOME"/tests/functional/src
@@ -0,0 +1,45 @@
+"""
+Инвалидация кэша из командной строки, например после ручной правки данных:
+
+    python invalidate.py --film <id> --person <id> --genre <id>
+"""
+import argparse
+import asyncio
+import logging
+
+from core.config import settings
+from db import elastic, memory, redis
+from services.invalidation import InvalidationService
+
+
+async def main(args: argparse.Namespace):
+    # Через MemoryCache удаление ключей публикуется воркерам сервиса,
+    # чтобы они сбросили свои локальные копии
+    cache = memory.MemoryCache(
+        redis.Redis(host=settings.redis_host,
+                    port=settings.redis_port,
+                    ssl=False),
+        expire=settings.local_cache_expire_in_seconds,
+        max_items=settings.local_cache_max_items,
+        max_bytes=settings.local_cache_max_bytes)
+    storage = elastic.Elastic(
+        hosts=[f'{settings.elastic_host}:{settings.elastic_port}'])
+    try:
+        keys = await InvalidationService(cache, storage).invalidate(
+            args.film, args.person, args.genre)
+    finally:
+        await cache.close()
+        await storage.close()
+    logging.info(f'Удалено ключей кэша: {len(keys)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Инвалидация кэша по id '
+                                                 'измененных сущностей')
+    parser.add_argument('--film', action='append', default=[],
+                        help='id измененного фильма')
+    parser.add_argument('--person', action='append', default=[],
+                        help='id измененной персоны')
+    parser.add_argument('--genre', action='append', default=[],
+                        help='id измененного жанра')
+    asyncio.run(main(parser.parse_args()))
@@ -2,24 +2,46 @@ import logging
 
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
 from fastapi.responses import ORJSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from api.v1 import films, genres, persons
+from api.v1 import cache, films, genres, persons, suggest, warmup
 from core.config import settings
 from core.logger import LOGGING
-from db import elastic, redis
+from core.metrics import MetricsMiddleware, latest
+from db import breaker, elastic, memory, redis, StorageUnavailableError
+from services import token
 
 
 async def startup():
     redis.redis = redis.Redis(host=settings.redis_host,
                               port=settings.redis_port,
                               ssl=False)
-    elastic.es = elastic.Elastic(
-        hosts=[f'{settings.elastic_host}:{settings.elastic_port}'])
+    if settings.local_cache_enabled:
+        # Локальный кэш процесса перед Redis
+        redis.redis = memory.MemoryCache(
+            redis.redis,
+            expire=settings.local_cache_expire_in_seconds,
+            max_items=settings.local_cache_max_items,
+            max_bytes=settings.local_cache_max_bytes)
+        await redis.redis.subscribe()
+    elastic.es = breaker.BreakerStorage(
+        elastic.Elastic(
+            hosts=[f'{settings.elastic_host}:{settings.elastic_port}']),
+        breaker.CircuitBreaker(
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            reset_timeout=settings.circuit_breaker_reset_timeout,
+            half_open_max_calls=settings.circuit_breaker_half_open_max_calls),
+        timeout=settings.storage_timeout_in_seconds)
+    if settings.warmup_enabled:
+        # Прогрев кэша при старте и далее по расписанию
+        warmup.warmer.start()
 
 
 async def shutdown():
+    await warmup.warmer.stop()
+    await token.close_session()
     await redis.redis.close()
     await elastic.es.close()
 
@@ -45,6 +67,25 @@ app = FastAPI(
     # написанную на Rust
     default_response_class=ORJSONResponse,
     lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(StorageUnavailableError)
+async def storage_unavailable_handler(request: Request,
+                                      exc: StorageUnavailableError):
+    # Данных нет в кэше, а хранилище недоступно
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={'detail': 'Storage is unavailable'},
+        headers={'Retry-After':
+                 str(int(settings.circuit_breaker_reset_timeout))})
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    # Метрики для Prometheus
+    return Response(content=latest(),
+                    headers={'Content-Type': CONTENT_TYPE_LATEST})
 
 
 # Подключаем роутер к серверу, указав префикс /v1/films
@@ -52,6 +93,9 @@ app = FastAPI(
 app.include_router(films.router, prefix='/api/v1/films', tags=['films'])
 app.include_router(genres.router, prefix='/api/v1/genres', tags=['genres'])
 app.include_router(persons.router, prefix='/api/v1/persons', tags=['persons'])
+app.include_router(suggest.router, prefix='/api/v1/suggest', tags=['suggest'])
+app.include_router(warmup.router, prefix='/api/v1/warmup', tags=['warmup'])
+app.include_router(cache.router, prefix='/api/v1/cache', tags=['cache'])
 
 
 if __name__ == '__main__':
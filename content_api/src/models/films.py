@@ -14,3 +14,8 @@ class Film(Model):
     writers_names: list[str] | None = None
     actors: list[dict] | None = None
     writers: list[dict] | None = None
+    # Плоские списки id персон для фильтрации без nested-запросов
+    directors_ids: list[str] | None = None
+    actors_ids: list[str] | None = None
+    writers_ids: list[str] | None = None
+    person_ids: list[str] | None = None
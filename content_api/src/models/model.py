@@ -34,6 +34,9 @@ class PaginateModel:
                                         alias=conf.SIZE_ALIAS,
                                         ge=1,
                                         le=500),
+                 cursor: str = Query(None,
+                                     description=conf.CURSOR_DESC),
                  ):
         self.page_number = page_number
         self.page_size = page_size
+        self.cursor = cursor
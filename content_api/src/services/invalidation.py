@@ -0,0 +1,54 @@
+from functools import lru_cache
+from fastapi import Depends
+
+from db import AbstractCache, AbstractStorage
+from db.elastic import get_elastic, Elastic
+from db.redis import get_redis, Redis
+from models.films import Film
+
+# Поля фильма, по которым находятся его персоны
+FILM_PERSONS_FIELDS = ['id', 'title', 'person_ids']
+
+
+class InvalidationService:
+    """
+    Удаляет из кэша записи, построенные из измененных сущностей: записи
+    по id, страницы списков, в которые сущности входят, и фильмографии
+    персон. Записи кэша помечаются тегами '<индекс>:<id>' при записи.
+    """
+
+    def __init__(self, cache: AbstractCache, storage: AbstractStorage):
+        self.cache = cache
+        self.storage = storage
+
+    async def _film_tags(self, film_ids: list[str]) -> list[str]:
+        tags = [f'movies:{_id}' for _id in film_ids]
+        # Агрегации по фильмам помечены индексом целиком
+        tags.append('movies')
+        # Персоны, только что добавленные в фильм, еще не связаны с ним
+        # в кэше: их фильмографии помечены id персоны
+        films = await self.storage.get_by_ids(film_ids, 'movies', Film,
+                                              FILM_PERSONS_FIELDS)
+        tags += [f'persons:{person_id}'
+                 for film in films for person_id in film.person_ids or []]
+        return tags
+
+    async def invalidate(self,
+                         films: list[str] = None,
+                         persons: list[str] = None,
+                         genres: list[str] = None) -> list[str]:
+        """
+        :return: удаленные ключи кэша
+        """
+        tags = await self._film_tags(films) if films else []
+        tags += [f'persons:{_id}' for _id in persons or []]
+        tags += [f'genres:{_id}' for _id in genres or []]
+
+        return await self.cache.invalidate_tags(list(dict.fromkeys(tags)))
+
+
+@lru_cache()
+def get_invalidation_service(
+        redis: Redis = Depends(get_redis),
+        elastic: Elastic = Depends(get_elastic)) -> InvalidationService:
+    return InvalidationService(redis, elastic)
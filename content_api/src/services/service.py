@@ -1,6 +1,33 @@
-from typing import Optional
+from time import perf_counter
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
+from core.config import settings
+from core.metrics import CACHE_REQUESTS, SERIALIZE_LATENCY, cache_result
 from db import AbstractStorage, AbstractCache
+from services.single_flight import SingleFlight
+
+
+def _keep(cache: AbstractCache, key: str) -> Callable[[], Awaitable] | None:
+    # Пока хранилище недоступно, устаревшая запись остается в кэше и
+    # продолжает отдаваться клиентам
+    if settings.cache_stale_in_seconds <= 0:
+        # Отдача устаревших записей отключена, а продление на 0 секунд
+        # удалило бы запись
+        return None
+    return lambda: cache.touch(key, settings.cache_stale_in_seconds)
+
+
+def _serialize(serialize: Callable, namespace: str, data) -> bytes:
+    started = perf_counter()
+    payload = serialize(data)
+    SERIALIZE_LATENCY.labels(namespace).observe(perf_counter() - started)
+    return payload
+
+
+def _tags(index: str, entities: list, tags: list[str] = None) -> list[str]:
+    # Запись помечается id всех сущностей, из которых она построена, чтобы
+    # изменение любой из них удаляло запись из кэша
+    return [f'{index}:{entity.id}' for entity in entities] + (tags or [])
 
 
 class IdRequestService:
@@ -8,15 +35,137 @@ class IdRequestService:
         self.cache = cache
         self.storage = storage
         self.model = model
+        self.flight = SingleFlight(cache)
 
-    async def process_by_id(self, _id: str, index: str) -> Optional:
-        entity = await self.cache.get_from_cache_by_id(_id=_id,
-                                                       model=self.model)
+    async def process_by_id(self, _id: str, index: str,
+                            refresh: bool = False) -> Optional:
+        """
+        :param refresh: не читать кэш, а перезаписать его данными из
+        хранилища
+        """
+        if refresh:
+            return await self._get_from_storage(_id, index)
+
+        prefix = await self._prefix(index)
+        entity, fresh_for = await self.cache.get_entry_from_cache_by_id(
+            _id, self.model, prefix)
+        cache_result(f'{index}:id', entity is not None, fresh_for)
+        if entity and fresh_for <= 0:
+            # Устаревшую запись отдаем сразу, а обновляем в фоне
+            self.flight.refresh(f'{index}:{_id}',
+                                lambda: self._get_from_storage(_id, index),
+                                _keep(self.cache, f'{prefix}{_id}'))
         if not entity:
-            entity = await self.storage.get_by_id(_id, index, self.model)
-            if not entity:
+            if await self._is_missing(_id, index):
+                CACHE_REQUESTS.labels(f'{index}:id', 'missing').inc()
                 return None
-            await self.cache.put_to_cache_by_id(entity=entity)
+            # Одновременные промахи по одному id ждут один запрос в хранилище
+            entity = await self.flight.do(
+                f'{index}:{_id}',
+                lambda: self._get_from_storage(_id, index),
+                lambda: self._get_from_cache(_id, prefix),
+                lambda: self._is_missing(_id, index))
+
+        return entity
+
+    async def process_by_id_payload(self,
+                                    serialize: Callable[[object], bytes],
+                                    _id: str,
+                                    index: str,
+                                    key: str) -> bytes | None:
+        """
+        Готовое тело ответа по id: при попадании в кэш байты отдаются как
+        есть, преобразование в модель ответа делается один раз при записи.
+        :param serialize: функция, превращающая сущность в тело ответа
+        """
+        payload, fresh_for = await self.cache.get_payload_entry_by_key(key)
+        cache_result(f'{index}:payload', payload is not None, fresh_for)
+        if payload and fresh_for <= 0:
+            self.flight.refresh(
+                f'payload:{key}',
+                lambda: self._get_payload(serialize, _id, index, key,
+                                          refresh=True),
+                _keep(self.cache, f'payload:{key}'))
+        if not payload:
+            payload = await self.flight.do(
+                f'payload:{key}',
+                lambda: self._get_payload(serialize, _id, index, key),
+                lambda: self.cache.get_payload_by_key(key))
+
+        return payload
+
+    async def _get_payload(self,
+                           serialize: Callable[[object], bytes],
+                           _id: str,
+                           index: str,
+                           key: str,
+                           refresh: bool = False) -> bytes | None:
+        # При обновлении сущность из кэша тоже может быть устаревшей
+        entity = await self.process_by_id(_id, index, refresh)
+        if not entity:
+            return None
+        payload = _serialize(serialize, index, entity)
+        await self.cache.put_payload_by_key(key, payload,
+                                            tags=_tags(index, [entity]))
+
+        return payload
+
+    async def process_by_ids(self,
+                             ids: list[str],
+                             index: str,
+                             fields: list[str] = None) -> list:
+        """
+        Сущности по списку id в порядке запроса: один запрос в кэш, один
+        запрос в хранилище за промахами и одна запись промахов в кэш.
+        Не найденные id пропускаются.
+        """
+        prefix = await self._prefix(index)
+        entities = await self.cache.get_from_cache_by_ids(ids, self.model,
+                                                          fields, prefix)
+        missed = list(dict.fromkeys(_id for _id in ids
+                                    if _id not in entities))
+        CACHE_REQUESTS.labels(f'{index}:id', 'hit').inc(len(entities))
+        CACHE_REQUESTS.labels(f'{index}:id', 'miss').inc(len(missed))
+        if missed:
+            found = await self.storage.get_by_ids(missed, index, self.model,
+                                                  fields)
+            if found:
+                await self.cache.put_to_cache_by_ids(found, fields,
+                                                     _tags(index, found),
+                                                     prefix)
+                entities.update({entity.id: entity for entity in found})
+
+        return [entities[_id] for _id in ids if _id in entities]
+
+    async def _prefix(self, index: str) -> str:
+        # Записи по id, как и ключи списков, включают поколение индекса:
+        # после перестроения индекса они читаются из нового индекса
+        generation = await self.cache.get_generation(index)
+        return f'{index}:{generation}:'
+
+    async def _get_from_cache(self, _id: str, prefix: str = '') -> Optional:
+        return await self.cache.get_from_cache_by_id(_id=_id,
+                                                     model=self.model,
+                                                     prefix=prefix)
+
+    async def _is_missing(self, _id: str, index: str) -> bool:
+        if not settings.negative_cache_id_expire_in_seconds:
+            return False
+        return await self.cache.is_missing(f'{index}:{_id}')
+
+    async def _get_from_storage(self, _id: str, index: str) -> Optional:
+        entity = await self.storage.get_by_id(_id, index, self.model)
+        if not entity:
+            # Повторные запросы несуществующего id не доходят до хранилища,
+            # пока не истечет отметка
+            if settings.negative_cache_id_expire_in_seconds:
+                await self.cache.put_missing(
+                    f'{index}:{_id}',
+                    settings.negative_cache_id_expire_in_seconds)
+            return None
+        await self.cache.put_to_cache_by_id(entity=entity,
+                                            tags=_tags(index, [entity]),
+                                            prefix=await self._prefix(index))
 
         return entity
 
@@ -26,6 +175,7 @@ class ListService:
         self.cache = cache
         self.storage = storage
         self.model = model
+        self.flight = SingleFlight(cache)
 
     async def process_list(self,
                            index: str,
@@ -33,25 +183,330 @@ class ListService:
                            search: dict = None,
                            key: str = None,
                            page: int = None,
-                           size: int = None) -> Optional:
+                           size: int = None,
+                           fields: list[str] = None,
+                           tags: list[str] = None,
+                           refresh: bool = False) -> Optional:
+        """
+        :param tags: теги записи в дополнение к id сущностей списка
+        :param refresh: не читать кэш, а перезаписать его данными из
+        хранилища
+        """
+        if not key:
+            return await self._get_from_storage(index, sort, search, key,
+                                                page, size, fields)
 
-        if key:
-            entities = await self.cache.get_from_cache_by_key(model=self.model,
-                                                              key=key,
-                                                              sort=sort)
-        else:
-            entities = None
+        return await self._cached_list(
+            index, key, sort,
+            lambda: self._get_from_storage(index, sort, search, key, page,
+                                           size, fields, tags),
+            refresh)
+
+    async def process_lists(self,
+                            index: str,
+                            searches: list[dict],
+                            key: str = None,
+                            size: int = None,
+                            fields: list[str] = None,
+                            tags: list[str] = None,
+                            refresh: bool = False) -> Optional:
+        """
+        Сущности, найденные несколькими запросами, одной записью кэша.
+        Каждый запрос получает не больше size сущностей, поэтому большой
+        результат одного запроса не вытесняет остальные.
+        :return: сущности всех запросов без повторов
+        """
+        if not key:
+            return await self._get_lists_from_storage(index, searches, key,
+                                                      size, fields)
 
+        return await self._cached_list(
+            index, key, None,
+            lambda: self._get_lists_from_storage(index, searches, key, size,
+                                                 fields, tags),
+            refresh)
+
+    async def _cached_list(self,
+                           index: str,
+                           key: str,
+                           sort: str | None,
+                           load: Callable[[], Awaitable],
+                           refresh: bool = False) -> Optional:
+        if refresh:
+            return await load()
+
+        entities, fresh_for = await self.cache.get_entry_from_cache_by_key(
+            self.model, key, sort)
+        cache_result(f'{index}:list', entities is not None, fresh_for)
+        if entities and fresh_for <= 0:
+            # Устаревший список отдаем сразу, а обновляем в фоне
+            self.flight.refresh(key, load, _keep(self.cache, key))
         if not entities:
-            entities = await self.storage.get_list(self.model,
-                                                   index,
-                                                   sort,
-                                                   search,
-                                                   page,
-                                                   size)
-            if not entities:
+            if await self._is_missing(key):
+                CACHE_REQUESTS.labels(f'{index}:list', 'missing').inc()
                 return None
-            if key:
-                await self.cache.put_to_cache_by_key(key, entities)
+            # Одновременные промахи по одному ключу ждут один запрос
+            # в хранилище
+            entities = await self.flight.do(
+                key, load, lambda: self._get_from_cache(key, sort),
+                lambda: self._is_missing(key))
+
+        return entities
+
+    async def _is_missing(self, key: str) -> bool:
+        if not settings.negative_cache_list_expire_in_seconds:
+            return False
+        return await self.cache.is_missing(key)
+
+    async def _put_missing(self, key: str = None):
+        # Пустые результаты поиска тоже запоминаем, но ненадолго
+        if key and settings.negative_cache_list_expire_in_seconds:
+            await self.cache.put_missing(
+                key, settings.negative_cache_list_expire_in_seconds)
+
+    async def _get_from_cache(self, key: str, sort: str = None) -> Optional:
+        return await self.cache.get_from_cache_by_key(model=self.model,
+                                                      key=key,
+                                                      sort=sort)
+
+    async def _get_from_storage(self,
+                                index: str,
+                                sort: str = None,
+                                search: dict = None,
+                                key: str = None,
+                                page: int = None,
+                                size: int = None,
+                                fields: list[str] = None,
+                                tags: list[str] = None) -> Optional:
+        entities = await self.storage.get_list(self.model,
+                                               index,
+                                               sort,
+                                               search,
+                                               page,
+                                               size,
+                                               fields)
+        if not entities:
+            await self._put_missing(key)
+            return None
+        if key:
+            await self.cache.put_to_cache_by_key(key, entities,
+                                                 _tags(index, entities, tags))
+
+        return entities
+
+    async def _get_lists_from_storage(self,
+                                      index: str,
+                                      searches: list[dict],
+                                      key: str = None,
+                                      size: int = None,
+                                      fields: list[str] = None,
+                                      tags: list[str] = None) -> Optional:
+        lists = await self.storage.get_lists(self.model, index, searches,
+                                             size, fields)
+        entities = list({entity.id: entity
+                         for entities in lists or [] for entity in entities}
+                        .values())
+        if not entities:
+            await self._put_missing(key)
+            return None
+        if key:
+            await self.cache.put_to_cache_by_key(key, entities,
+                                                 _tags(index, entities, tags))
 
         return entities
+
+    async def process_page(self,
+                           index: str,
+                           sort: str = None,
+                           search: dict = None,
+                           size: int = None,
+                           cursor: str = None,
+                           fields: list[str] = None) \
+            -> tuple[list, str | None] | None:
+        # Страницы курсора привязаны к point in time и не кэшируются
+        return await self.storage.get_page(self.model,
+                                           index,
+                                           sort,
+                                           search,
+                                           size,
+                                           cursor,
+                                           fields)
+
+    def process_scan(self,
+                     index: str,
+                     search: dict = None,
+                     size: int = None,
+                     fields: list[str] = None) -> AsyncIterator[list[dict]]:
+        """
+        Пачки всех документов по запросу в том виде, в каком они хранятся.
+        Обход целиком не кэшируется и не держит в памяти больше одной пачки
+        """
+        return self.storage.scan(index, search, size, fields)
+
+    async def process_list_payload(self,
+                                   serialize: Callable[[list], bytes],
+                                   index: str,
+                                   sort: str = None,
+                                   search: dict = None,
+                                   key: str = None,
+                                   page: int = None,
+                                   size: int = None,
+                                   fields: list[str] = None,
+                                   refresh_ahead: float = None,
+                                   expire: float = None,
+                                   tags: list[str] = None) -> bytes | None:
+        """
+        В отличие от process_list кэширует не сущности, а готовое тело
+        ответа: при попадании в кэш байты отдаются без разбора и сортировки.
+        :param serialize: функция, превращающая список сущностей в тело ответа
+        :param refresh_ahead: запись, которая устареет раньше, чем через
+        столько секунд, обновить сразу, а не в фоне. Запись, свежая на
+        больший срок, не обновляется
+        :param expire: срок свежести записи, если он отличается от общего
+        :param tags: теги записи в дополнение к id сущностей списка
+        """
+        if not key:
+            return await self._get_payload_from_storage(serialize, index,
+                                                        sort, search, key,
+                                                        page, size, fields,
+                                                        expire, tags)
+
+        payload, fresh_for = await self.cache.get_payload_entry_by_key(key)
+        cache_result(f'{index}:payload', payload is not None, fresh_for)
+        if refresh_ahead is not None and payload and \
+                fresh_for <= refresh_ahead:
+            # Загрузка ниже идет через SingleFlight и распределенную
+            # блокировку, как и при промахе
+            payload = None
+        if payload and fresh_for <= 0:
+            self.flight.refresh(
+                f'payload:{key}',
+                lambda: self._get_payload_from_storage(serialize, index, sort,
+                                                       search, key, page,
+                                                       size, fields, expire,
+                                                       tags),
+                _keep(self.cache, f'payload:{key}'))
+        if not payload:
+            if await self._is_missing(key):
+                CACHE_REQUESTS.labels(f'{index}:payload', 'missing').inc()
+                return None
+            payload = await self.flight.do(
+                f'payload:{key}',
+                lambda: self._get_payload_from_storage(serialize, index, sort,
+                                                       search, key, page,
+                                                       size, fields, expire,
+                                                       tags),
+                lambda: self.cache.get_payload_by_key(key),
+                lambda: self._is_missing(key))
+
+        return payload
+
+    async def _get_payload_from_storage(self,
+                                        serialize: Callable[[list], bytes],
+                                        index: str,
+                                        sort: str = None,
+                                        search: dict = None,
+                                        key: str = None,
+                                        page: int = None,
+                                        size: int = None,
+                                        fields: list[str] = None,
+                                        expire: float = None,
+                                        tags: list[str] = None) \
+            -> bytes | None:
+        entities = await self.storage.get_list(self.model,
+                                               index,
+                                               sort,
+                                               search,
+                                               page,
+                                               size,
+                                               fields)
+        if not entities:
+            await self._put_missing(key)
+            return None
+        # Elasticsearch уже вернул сущности в нужном порядке
+        payload = _serialize(serialize, index, entities)
+        if key:
+            await self.cache.put_payload_by_key(key, payload, expire,
+                                                _tags(index, entities, tags))
+
+        return payload
+
+    async def process_aggregations_payload(self,
+                                           serialize: Callable[[dict], bytes],
+                                           index: str,
+                                           search: dict = None,
+                                           aggs: dict = None,
+                                           key: str = None) -> bytes | None:
+        """
+        Готовое тело ответа с агрегациями по документам, кэшируется по key
+        :param serialize: функция, превращающая результаты агрегаций в тело
+        ответа
+        """
+        def load():
+            return self._get_aggregations_payload(serialize, index, search,
+                                                  aggs, key)
+
+        return await self._cached_payload(f'{index}:aggregations', key, load)
+
+    async def process_composed_payload(
+            self,
+            index: str,
+            key: str,
+            build: Callable[[bool], Awaitable[tuple[bytes, list[str]] | None]]
+    ) -> bytes | None:
+        """
+        Готовое тело ответа, собранное из сущностей нескольких индексов,
+        кэшируется по key
+        :param build: корутина-функция, возвращающая тело ответа и теги
+        записи. Получает refresh: при обновлении устаревшей записи
+        сущности берутся из хранилища, а не из кэша
+        """
+        async def load(refresh: bool = False):
+            res = await build(refresh)
+            if not res:
+                return None
+            payload, tags = res
+            await self.cache.put_payload_by_key(key, payload, tags=tags)
+            return payload
+
+        return await self._cached_payload(f'{index}:payload', key, load,
+                                          lambda: load(refresh=True))
+
+    async def _cached_payload(self,
+                              namespace: str,
+                              key: str,
+                              load: Callable[[], Awaitable],
+                              reload: Callable[[], Awaitable] = None) \
+            -> bytes | None:
+        """
+        :param load: загрузка тела ответа при промахе
+        :param reload: обновление устаревшей записи. По умолчанию - load
+        """
+        payload, fresh_for = await self.cache.get_payload_entry_by_key(key)
+        cache_result(namespace, payload is not None, fresh_for)
+        if payload and fresh_for <= 0:
+            self.flight.refresh(f'payload:{key}', reload or load,
+                                _keep(self.cache, f'payload:{key}'))
+        if not payload:
+            payload = await self.flight.do(
+                f'payload:{key}',
+                load,
+                lambda: self.cache.get_payload_by_key(key))
+
+        return payload
+
+    async def _get_aggregations_payload(self,
+                                        serialize: Callable[[dict], bytes],
+                                        index: str,
+                                        search: dict = None,
+                                        aggs: dict = None,
+                                        key: str = None) -> bytes | None:
+        aggregations = await self.storage.get_aggregations(index, search,
+                                                           aggs)
+        if aggregations is None:
+            return None
+        payload = _serialize(serialize, index, aggregations)
+        # Агрегации зависят от всех документов индекса
+        await self.cache.put_payload_by_key(key, payload, tags=[index])
+
+        return payload
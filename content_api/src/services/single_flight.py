@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from core.config import settings
+from db import AbstractCache, StorageUnavailableError
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные запросы к хранилищу по одному ключу кэша.
+    Первый запрос (лидер) выполняет загрузку, остальные ждут его результат.
+    Если включена распределенная блокировка (CACHE_LOCK_ENABLED), то между
+    воркерами координация идет через ключ блокировки в кэше: воркер, не
+    получивший блокировку, ждет пока лидер положит данные в кэш.
+    """
+
+    def __init__(self, cache: AbstractCache):
+        self.cache = cache
+        self._calls: dict[str, asyncio.Task] = {}
+        # Фоновые обновления устаревших записей. Отдельно от _calls, так как
+        # их результат никто не ждет
+        self._refreshes: dict[str, asyncio.Task] = {}
+
+    async def do(self,
+                 key: str,
+                 load: Callable[[], Awaitable],
+                 read: Callable[[], Awaitable] = None,
+                 missing: Callable[[], Awaitable[bool]] = None) -> Optional:
+        """
+        :param key: ключ, по которому объединяются запросы
+        :param load: корутина-функция, загружающая данные из хранилища и
+        кладущая их в кэш
+        :param read: корутина-функция, читающая данные из кэша. Нужна для
+        ожидания результата другого воркера при распределенной блокировке
+        :param missing: корутина-функция, проверяющая отметку об отсутствии
+        данных. Если другой воркер не нашел данные, то ответ - None без
+        запроса в хранилище
+        :return: результат load
+        """
+        task = self._calls.get(key)
+        if not task:
+            task = asyncio.ensure_future(self._call(key, load, read,
+                                                    missing))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # shield, чтобы отмена одного из ожидающих запросов не отменяла
+        # загрузку для остальных
+        return await asyncio.shield(task)
+
+    def refresh(self,
+                key: str,
+                load: Callable[[], Awaitable],
+                keep: Callable[[], Awaitable] = None):
+        """
+        Запускает загрузку в фоне, не дожидаясь результата. Пока загрузка
+        по ключу идет, повторные вызовы ничего не делают.
+        :param key: ключ, по которому объединяются запросы
+        :param load: корутина-функция, загружающая данные из хранилища и
+        кладущая их в кэш
+        :param keep: корутина-функция, продлевающая жизнь устаревшей записи,
+        если хранилище недоступно
+        """
+        if key in self._refreshes:
+            return
+        task = asyncio.ensure_future(self._refresh(key, load, keep))
+        self._refreshes[key] = task
+        task.add_done_callback(lambda t: self._refreshes.pop(key, None))
+
+    async def _refresh(self, key: str, load, keep) -> Optional:
+        lock = None
+        if settings.cache_lock_enabled:
+            # Устаревшую запись обновляет только один воркер
+            lock = await self.cache.lock(key)
+            if not lock:
+                return None
+        try:
+            return await load()
+        except StorageUnavailableError:
+            # Пока хранилище недоступно, отдаем последнее известное значение
+            if keep:
+                await keep()
+        except Exception:
+            logging.exception(f'Не удалось обновить запись кэша {key}')
+        finally:
+            if lock:
+                await self.cache.unlock(lock)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    async def _call(self, key: str, load, read, missing) -> Optional:
+        if not settings.cache_lock_enabled or not read:
+            return await load()
+
+        lock = await self.cache.lock(key)
+        if not lock:
+            done, res = await self._wait(key, read, missing)
+            if done:
+                return res
+        try:
+            return await load()
+        finally:
+            if lock:
+                await self.cache.unlock(lock)
+
+    async def _wait(self, key: str, read, missing) -> tuple[bool, Optional]:
+        # Ждем, пока воркер, получивший блокировку, положит в кэш данные или
+        # отметку об их отсутствии. Возвращаем, дождались ли ответа, и сам
+        # ответ. Если блокировку отпустили ни с чем или не дождались - идем
+        # в хранилище сами.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.cache_lock_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.cache_lock_poll_interval)
+            # Блокировку проверяем до чтения: иначе можно пропустить данные,
+            # записанные перед ее снятием
+            locked = await self.cache.is_locked(key)
+            res = await read()
+            if res:
+                return True, res
+            if missing and await missing():
+                return True, None
+            if not locked:
+                break
+        return False, None
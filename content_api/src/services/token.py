@@ -1,10 +1,35 @@
 import http
+from collections import OrderedDict
+from time import monotonic
 
 import aiohttp
 from fastapi import HTTPException, Request, status as st
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import jwt, JWTError
 
 import core.config as conf
+from db import redis
+
+ALGORITHM = "HS256"
+# Не больше стольких пользователей храним в кэше ролей
+ROLES_CACHE_MAX_SIZE = 10000
+
+credentials_exception = HTTPException(
+    status_code=st.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+permissions_exception = HTTPException(
+    status_code=st.HTTP_403_FORBIDDEN,
+    detail="You don't have sufficient permissions to make this request",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+# Общая на процесс сессия к auth_api: переиспользует соединения
+session: aiohttp.ClientSession | None = None
+# {user_id: (время истечения, роли пользователя)}
+roles_cache: OrderedDict[str, tuple[float, set[str]]] = OrderedDict()
 
 
 class JWTBearer(HTTPBearer):
@@ -30,24 +55,39 @@ class JWTBearer(HTTPBearer):
 security_jwt = JWTBearer()
 
 
-async def check_roles(token: str, roles: str) -> None:
+def _get_session() -> aiohttp.ClientSession:
+    global session
+    if not session or session.closed:
+        session = aiohttp.ClientSession(
+            base_url=f'http://{conf.settings.host_auth}:'
+                     f'{conf.settings.port_auth}')
+    return session
+
+
+async def close_session():
+    if session:
+        await session.close()
+
+
+async def _auth_request(method: str, url: str, token: str, **kwargs) -> dict:
+    """
+    Запрос к auth_api. Ответ с ошибкой пробрасывается клиенту с тем же
+    статусом.
+    """
+    headers = {'Authorization': f'Bearer {token}'}
     try:
-        headers = {'Authorization': f'Bearer {token}'}
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post(url=f'http://{conf.settings.host_auth}:'
-                                        f'{conf.settings.port_auth}'
-                                        f'/api/v1/users/check_roles',
-                                    json={
-                                        'roles': f'{roles}'
-                                    }) as status:
-                detail = await status.json()
-                status_code = status.status
-                if status_code != st.HTTP_200_OK:
-                    raise HTTPException(
-                        status_code=status_code,
-                        detail=detail['detail'],
-                        headers={"WWW-Authenticate": "Bearer"},
-                    )
+        async with _get_session().request(method, url,
+                                          headers=headers,
+                                          **kwargs) as status:
+            detail = await status.json()
+            status_code = status.status
+            if status_code != st.HTTP_200_OK:
+                raise HTTPException(
+                    status_code=status_code,
+                    detail=detail['detail'],
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            return detail
     except aiohttp.ServerTimeoutError as err:
         raise HTTPException(status_code=st.HTTP_504_GATEWAY_TIMEOUT,
                             detail=err.strerror)
@@ -57,3 +97,53 @@ async def check_roles(token: str, roles: str) -> None:
     except aiohttp.ClientError as err:
         raise HTTPException(status_code=st.HTTP_503_SERVICE_UNAVAILABLE,
                             detail=err.strerror)
+
+
+async def _decode_token(token: str) -> str:
+    """
+    Проверяет подпись и срок действия access-token без запроса к auth_api
+    :return: id пользователя
+    """
+    try:
+        payload = jwt.decode(token, conf.settings.secret_key,
+                             algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    user_id = payload.get('sub')
+    if user_id is None:
+        raise credentials_exception
+
+    # auth_api кладет в общий Redis токены, отозванные при выходе
+    if await redis.redis.exists(f'invalid-access-token:{token}'):
+        raise credentials_exception
+    return user_id
+
+
+async def _get_user_roles(token: str, user_id: str) -> set[str]:
+    item = roles_cache.get(user_id)
+    if item and item[0] > monotonic():
+        return item[1]
+
+    user = await _auth_request('GET', '/api/v1/users/me', token)
+    roles = {role.lower() for role in user['roles']}
+
+    roles_cache[user_id] = \
+        (monotonic() + conf.settings.roles_cache_expire_in_seconds, roles)
+    roles_cache.move_to_end(user_id)
+    if len(roles_cache) > ROLES_CACHE_MAX_SIZE:
+        roles_cache.popitem(last=False)
+    return roles
+
+
+async def check_roles(token: str, roles: str) -> None:
+    if conf.settings.auth_local_verify:
+        # Токен проверяем локально, роли берем из кэша и только при
+        # промахе спрашиваем у auth_api
+        user_id = await _decode_token(token)
+        user_roles = await _get_user_roles(token, user_id)
+        if not user_roles.intersection(roles.lower().split()):
+            raise permissions_exception
+        return
+
+    await _auth_request('POST', '/api/v1/users/check_roles', token,
+                        json={'roles': f'{roles}'})
@@ -0,0 +1,87 @@
+import aiohttp
+import pytest
+
+from http import HTTPStatus
+from logging import config as logging_config
+
+from tests.functional.settings import settings
+from tests.functional.utils.logger import LOGGING
+
+# Применяем настройки логирования
+logging_config.dictConfig(LOGGING)
+pytestmark = pytest.mark.asyncio
+
+PREFIX = '/api/v1/cache'
+
+
+@pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
+class TestCacheInvalidationAuth:
+    async def test_invalidate_anonymous(self,
+                                        session_client):
+        url = settings.service_url + f'{PREFIX}/invalidate'
+        async with session_client.post(url,
+                                       json={'genres': ['789']}) \
+                as response:
+            assert response.status == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
+@pytest.mark.xfail(reason="It fails if admin user doesn't exist in DB or "
+                          "auth server isn't running")
+class TestCacheInvalidation:
+    @pytest.mark.parametrize(
+        'url, changes',
+        [
+            (
+                    '/api/v1/persons/1/film',
+                    {'persons': ['1']}
+            ),
+            (
+                    '/api/v1/genres/789',
+                    {'genres': ['789']}
+            ),
+        ]
+    )
+    async def test_invalidate(self,
+                              session_client,
+                              get_token,
+                              url,
+                              changes):
+        access_data = {"username": "admin@example.com",
+                       "password": "Secret123"}
+        access_token = await get_token(access_data)
+        header = {'Authorization': f'Bearer {access_token}'}
+
+        async with session_client.get(settings.service_url + url) as response:
+            assert response.status == HTTPStatus.OK
+
+        url = settings.service_url + f'{PREFIX}/invalidate'
+        async with aiohttp.ClientSession(headers=header) as session:
+            async with session.post(url, json=changes) as response:
+                body = await response.json()
+
+                assert response.status == HTTPStatus.OK
+                assert body['keys'] >= 1
+
+            # Записи уже удалены
+            async with session.post(url, json=changes) as response:
+                body = await response.json()
+
+                assert response.status == HTTPStatus.OK
+                assert body['keys'] == 0
+
+    async def test_invalidate_unknown(self,
+                                      get_token):
+        access_data = {"username": "admin@example.com",
+                       "password": "Secret123"}
+        access_token = await get_token(access_data)
+        header = {'Authorization': f'Bearer {access_token}'}
+
+        url = settings.service_url + f'{PREFIX}/invalidate'
+        async with aiohttp.ClientSession(headers=header) as session:
+            async with session.post(url,
+                                    json={'films': ['unknown']}) as response:
+                body = await response.json()
+
+                assert response.status == HTTPStatus.OK
+                assert body['keys'] == 0
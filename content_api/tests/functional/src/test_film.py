@@ -1,4 +1,6 @@
+import json
 import logging
+import uuid
 
 import aiohttp
 import pytest
@@ -218,6 +220,231 @@ class TestFilms:
             assert response.status == expected_answer['status']
             assert body['detail'] == expected_answer['detail']
 
+    @pytest.mark.parametrize(
+        'url, expected_answer',
+        [
+            (
+                    f'{PREFIX}/?fields=uuid,title',
+                    {'status': HTTPStatus.OK, 'keys': ['uuid', 'title']}
+            ),
+            (
+                    f'{PREFIX}/search?query=Star&fields=imdb_rating',
+                    {'status': HTTPStatus.OK, 'keys': ['imdb_rating']}
+            ),
+        ]
+    )
+    async def test_get_all_films_fields(self,
+                                        session_client,
+                                        url,
+                                        expected_answer):
+        url = settings.service_url + url
+
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert response.status == expected_answer['status']
+            assert list(body[0].keys()) == expected_answer['keys']
+
+    async def test_get_all_films_fields_unknown(self,
+                                                session_client):
+        url = settings.service_url + f'{PREFIX}/?fields=uuid,doesntexist'
+
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+            assert body['detail'] == 'Unknown fields: doesntexist'
+
+    # 60 фильмов: неполная последняя страница и ровно три полных
+    @pytest.mark.parametrize('page_size', [25, 20])
+    async def test_get_all_films_cursor(self,
+                                        session_client,
+                                        page_size):
+        url = settings.service_url + f'{PREFIX}/'
+        params = {'cursor': '*', 'page_size': page_size,
+                  'sort': '-imdb_rating'}
+        films = []
+
+        while params['cursor']:
+            async with session_client.get(url, params=params) as response:
+                body = await response.json()
+
+                assert response.status == HTTPStatus.OK
+                films += body
+                params['cursor'] = response.headers.get('X-Next-Cursor')
+
+        imdb_rating_list = [i['imdb_rating'] for i in films]
+        assert len({i['uuid'] for i in films}) == 60
+        assert sorted(imdb_rating_list, reverse=True) == imdb_rating_list
+
+    async def test_get_all_films_cursor_invalid(self,
+                                                session_client):
+        url = settings.service_url + f'{PREFIX}/?cursor=doesntexist'
+
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert response.status == HTTPStatus.NOT_FOUND
+            assert body['detail'] == 'movies not found'
+
+    async def test_get_all_films_not_modified(self,
+                                              session_client):
+        url = settings.service_url + f'{PREFIX}/'
+
+        async with session_client.get(url) as response:
+            etag = response.headers.get('ETag')
+
+            assert response.status == HTTPStatus.OK
+            assert etag
+            assert 'max-age' in response.headers.get('Cache-Control')
+
+        headers = {'If-None-Match': etag}
+        async with session_client.get(url, headers=headers) as response:
+            assert response.status == HTTPStatus.NOT_MODIFIED
+            assert response.headers.get('ETag') == etag
+            assert await response.read() == b''
+
+        headers = {'If-None-Match': '"doesntexist"'}
+        async with session_client.get(url, headers=headers) as response:
+            assert response.status == HTTPStatus.OK
+
+    @pytest.mark.parametrize(
+        'url, expected_answer',
+        [
+            (
+                    f'{PREFIX}/facets',
+                    {'status': HTTPStatus.OK, 'total': 60}
+            ),
+            (
+                    f'{PREFIX}/facets?genre=Action&interval=5',
+                    {'status': HTTPStatus.OK, 'total': 60}
+            ),
+            (
+                    f'{PREFIX}/facets?genre=doesntexist',
+                    {'status': HTTPStatus.OK, 'total': 0}
+            ),
+        ]
+    )
+    async def test_get_films_facets(self,
+                                    session_client,
+                                    url,
+                                    expected_answer):
+        url = settings.service_url + url
+
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert response.status == expected_answer['status']
+            assert body['total'] == expected_answer['total']
+            assert sum(i['count'] for i in body['imdb_rating']) == \
+                   expected_answer['total']
+            if expected_answer['total']:
+                assert {i['name']: i['count'] for i in body['genres']} == \
+                       {'Action': 60, 'Music Story': 60}
+            else:
+                assert body['genres'] == []
+
+    @pytest.mark.parametrize(
+        'url, expected_answer',
+        [
+            (
+                    f'{PREFIX}/export?fields=title',
+                    {'status': HTTPStatus.OK, 'length': 60}
+            ),
+            (
+                    f'{PREFIX}/export?fields=title'
+                    f'&modified_since=2023-01-01T00:00:00',
+                    {'status': HTTPStatus.OK, 'length': 60}
+            ),
+            (
+                    f'{PREFIX}/export?fields=title'
+                    f'&modified_since=2030-01-01T00:00:00',
+                    {'status': HTTPStatus.OK, 'length': 0}
+            ),
+        ]
+    )
+    async def test_export_films(self,
+                                session_client,
+                                url,
+                                expected_answer):
+        url = settings.service_url + url
+
+        async with session_client.get(url) as response:
+            lines = (await response.read()).splitlines()
+
+            assert response.status == expected_answer['status']
+            assert response.headers['Content-Type'] == 'application/x-ndjson'
+            assert len(lines) == expected_answer['length']
+            for line in lines:
+                film = json.loads(line)
+                assert sorted(film.keys()) == ['id', 'title']
+
+    async def test_export_films_unknown_field(self,
+                                              session_client):
+        url = settings.service_url + f'{PREFIX}/export?fields=doesntexist'
+
+        async with session_client.get(url) as response:
+            assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    async def test_films_batch(self,
+                               session_client):
+        url = settings.service_url + f'{PREFIX}/?page_size=3'
+        async with session_client.get(url) as response:
+            ids = [film['uuid'] for film in await response.json()]
+
+        # Неизвестный id пропускается, остальные идут в порядке запроса
+        ids = ids[::-1] + [str(uuid.uuid4())]
+        url = settings.service_url + f'{PREFIX}/batch'
+        async with session_client.post(url, json=ids) as response:
+            body = await response.json()
+
+        assert response.status == HTTPStatus.OK
+        assert [film['uuid'] for film in body] == ids[:-1]
+        assert list(body[0].keys()) == ['uuid', 'title', 'imdb_rating',
+                                        'description', 'genre', 'actors',
+                                        'writers', 'directors']
+
+    async def test_films_batch_not_found(self,
+                                         session_client):
+        url = settings.service_url + f'{PREFIX}/batch'
+
+        async with session_client.post(url,
+                                       json=[str(uuid.uuid4())]) as response:
+            body = await response.json()
+
+        assert response.status == HTTPStatus.OK
+        assert body == []
+
+    async def test_films_batch_too_many(self,
+                                        session_client):
+        url = settings.service_url + f'{PREFIX}/batch'
+        ids = [str(uuid.uuid4()) for _ in range(101)]
+
+        async with session_client.post(url, json=ids) as response:
+            assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    async def test_films_batch_empty(self,
+                                     session_client):
+        url = settings.service_url + f'{PREFIX}/batch'
+
+        async with session_client.post(url, json=[]) as response:
+            assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    async def test_films_batch_duplicates(self,
+                                          session_client):
+        url = settings.service_url + f'{PREFIX}/?page_size=2'
+        async with session_client.get(url) as response:
+            ids = [film['uuid'] for film in await response.json()]
+
+        # Повторяющийся id возвращается один раз, на месте первого
+        url = settings.service_url + f'{PREFIX}/batch'
+        async with session_client.post(url,
+                                       json=ids + ids[:1]) as response:
+            body = await response.json()
+
+        assert response.status == HTTPStatus.OK
+        assert [film['uuid'] for film in body] == ids
+
 
 @pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
 @pytest.mark.xfail(reason="It fails if admin user doesn't exist in DB or "
@@ -1,10 +1,14 @@
+import asyncio
 import logging
 import pytest
+import redis
 
+from elasticsearch.helpers import async_bulk
 from http import HTTPStatus
 from logging import config as logging_config
 
 from tests.functional.settings import settings
+from tests.functional.testdata import es_data, es_schemas
 from tests.functional.utils.logger import LOGGING
 
 # Применяем настройки логирования
@@ -182,3 +186,55 @@ class TestGenreIdRedis:
             assert len(body) == expected_answer['length']
             assert body['uuid'] == _id
             assert list(body.keys()) == ['uuid', 'name']
+
+
+async def _create_index(es_client, name: str, docs: list[dict]):
+    schema = es_schemas.schemas['genres']
+    await es_client.indices.create(index=name,
+                                   settings=schema['settings'],
+                                   mappings=schema['mappings'])
+    await async_bulk(es_client, [{'_index': name,
+                                  '_id': doc[settings.es_id_field],
+                                  '_source': doc} for doc in docs])
+    await es_client.indices.refresh(index=name)
+
+
+@pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
+class TestGenreReindex:
+    async def test_get_genre_after_swap(self,
+                                        session_client,
+                                        es_client):
+        url = settings.service_url + PREFIX + '/789'
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert body['name'] == 'Action'
+
+        # Перестроение индекса, как в etl/src/reindex.py: новый индекс,
+        # переключение псевдонима и новое поколение ключей кэша
+        name = 'genres_reindexed'
+        docs = [dict(doc, name='Drama') if doc['id'] == '789' else doc
+                for doc in es_data.genres]
+        await _create_index(es_client, name, docs)
+        try:
+            await es_client.indices.update_aliases(body={'actions': [
+                {'add': {'index': name, 'alias': 'genres'}},
+                {'remove_index': {'index': 'genres'}}]})
+            redis_cli = redis.Redis(host=settings.redis_host,
+                                    port=settings.redis_port)
+            redis_cli.incr('generation:genres')
+            redis_cli.publish('cache:invalidate',
+                              'tests:generation:genres')
+            # Воркеры сбрасывают локальную копию поколения по сообщению
+            await asyncio.sleep(0.5)
+
+            async with session_client.get(url) as response:
+                body = await response.json()
+
+                assert response.status == HTTPStatus.OK
+                assert body['name'] == 'Drama'
+        finally:
+            # Фикстура es_write_data удаляет индекс genres сама
+            await es_client.indices.delete(index=name)
+            if not await es_client.indices.exists(index='genres'):
+                await _create_index(es_client, 'genres', es_data.genres)
@@ -0,0 +1,28 @@
+import pytest
+
+from http import HTTPStatus
+from logging import config as logging_config
+
+from tests.functional.settings import settings
+from tests.functional.utils.logger import LOGGING
+
+# Применяем настройки логирования
+logging_config.dictConfig(LOGGING)
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
+class TestMetrics:
+    async def test_metrics(self, session_client):
+        url = settings.service_url + '/api/v1/genres/789'
+        async with session_client.get(url) as response:
+            assert response.status == HTTPStatus.OK
+
+        url = settings.service_url + '/metrics'
+        async with session_client.get(url) as response:
+            body = await response.text()
+
+        assert response.status == HTTPStatus.OK
+        assert 'content_api_request_duration_seconds_count{method="GET",' \
+               'route="/api/v1/genres/{genre_id}",status="200"}' in body
+        assert 'content_api_cache_requests_total' in body
@@ -0,0 +1,64 @@
+import pytest
+
+from http import HTTPStatus
+from logging import config as logging_config
+
+from tests.functional.settings import settings
+from tests.functional.utils.logger import LOGGING
+
+# Применяем настройки логирования
+logging_config.dictConfig(LOGGING)
+pytestmark = pytest.mark.asyncio
+
+PREFIX = '/api/v1/suggest'
+
+
+@pytest.mark.usefixtures('redis_clear_data_before_after', 'es_write_data')
+class TestSuggest:
+    @pytest.mark.parametrize(
+        'url, expected_answer',
+        [
+            (
+                    f'{PREFIX}/?query=Ja',
+                    {'status': HTTPStatus.OK, 'films': 0,
+                     'full_name': 'Jack Jones'}
+            ),
+            (
+                    f'{PREFIX}/?query=st',
+                    {'status': HTTPStatus.OK, 'films': 10,
+                     'full_name': 'Steven Spielberg'}
+            ),
+            (
+                    f'{PREFIX}/?query=the sta&size=5',
+                    {'status': HTTPStatus.OK, 'films': 5,
+                     'full_name': None}
+            ),
+        ]
+    )
+    async def test_suggest(self,
+                           session_client,
+                           url,
+                           expected_answer):
+        url = settings.service_url + url
+
+        async with session_client.get(url) as response:
+            body = await response.json()
+
+            assert response.status == expected_answer['status']
+            assert list(body.keys()) == ['films', 'persons']
+            assert len(body['films']) == expected_answer['films']
+            for film in body['films']:
+                assert list(film.keys()) == ['uuid', 'title']
+                assert film['title'] == 'The Star'
+            if expected_answer['full_name']:
+                assert expected_answer['full_name'] in \
+                       [person['full_name'] for person in body['persons']]
+            else:
+                assert body['persons'] == []
+
+    async def test_suggest_empty_query(self,
+                                       session_client):
+        url = settings.service_url + f'{PREFIX}/?query='
+
+        async with session_client.get(url) as response:
+            assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
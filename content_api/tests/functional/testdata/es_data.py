@@ -24,6 +24,11 @@ movies = [{
         {'id': '1', 'name': 'Jack Jones'},
         {'id': '4', 'name': 'Serena Williams'}
     ],
+    'directors_ids': ['1', '2'],
+    'actors_ids': ['1', '3'],
+    'writers_ids': ['1', '4'],
+    'person_ids': ['1', '2', '3', '4'],
+    'modified': '2023-07-11T22:20:08.527046+00:00',
 } for _ in range(60)]
 
 genres = [
@@ -22,6 +22,11 @@ movies = {
         "russian_stemmer": {
           "type": "stemmer",
           "language": "russian"
+        },
+        "autocomplete_filter": {
+          "type": "edge_ngram",
+          "min_gram": 1,
+          "max_gram": 20
         }
       },
       "analyzer": {
@@ -35,6 +40,19 @@ movies = {
             "russian_stop",
             "russian_stemmer"
           ]
+        },
+        "autocomplete": {
+          "tokenizer": "standard",
+          "filter": [
+            "lowercase",
+            "autocomplete_filter"
+          ]
+        },
+        "autocomplete_search": {
+          "tokenizer": "standard",
+          "filter": [
+            "lowercase"
+          ]
         }
       }
     }
@@ -57,7 +75,12 @@ movies = {
           },
           "name": {
             "type": "text",
-            "analyzer": "ru_en"
+            "analyzer": "ru_en",
+            "fields": {
+              "raw": {
+                "type":  "keyword"
+              }
+            }
           }
         }
       },
@@ -67,6 +90,11 @@ movies = {
         "fields": {
           "raw": {
             "type":  "keyword"
+          },
+          "suggest": {
+            "type": "text",
+            "analyzer": "autocomplete",
+            "search_analyzer": "autocomplete_search"
           }
         }
       },
@@ -120,6 +148,21 @@ movies = {
             "analyzer": "ru_en"
           }
         }
+      },
+      "directors_ids": {
+        "type": "keyword"
+      },
+      "actors_ids": {
+        "type": "keyword"
+      },
+      "writers_ids": {
+        "type": "keyword"
+      },
+      "person_ids": {
+        "type": "keyword"
+      },
+      "modified": {
+        "type": "date"
       }
     }
   }
@@ -213,6 +256,11 @@ persons = {
         "russian_stemmer": {
           "type": "stemmer",
           "language": "russian"
+        },
+        "autocomplete_filter": {
+          "type": "edge_ngram",
+          "min_gram": 1,
+          "max_gram": 20
         }
       },
       "analyzer": {
@@ -226,6 +274,19 @@ persons = {
             "russian_stop",
             "russian_stemmer"
           ]
+        },
+        "autocomplete": {
+          "tokenizer": "standard",
+          "filter": [
+            "lowercase",
+            "autocomplete_filter"
+          ]
+        },
+        "autocomplete_search": {
+          "tokenizer": "standard",
+          "filter": [
+            "lowercase"
+          ]
         }
       }
     }
@@ -242,6 +303,11 @@ persons = {
         "fields": {
           "raw": {
             "type":  "keyword"
+          },
+          "suggest": {
+            "type": "text",
+            "analyzer": "autocomplete",
+            "search_analyzer": "autocomplete_search"
           }
         }
       }
@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest_asyncio
+from fakeredis.aioredis import FakeRedis
+
+# Модули сервиса импортируются так же, как при запуске сервиса: из src
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+from db.redis import Redis  # noqa: E402
+
+
+@pytest_asyncio.fixture
+async def cache():
+    redis = Redis()
+    redis.session = FakeRedis()
+    yield redis
+    await redis.session.flushall()
+    await redis.session.close()
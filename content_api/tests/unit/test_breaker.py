@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from elasticsearch import ConnectionError
+from pydantic import ValidationError
+
+from core.config import settings
+from db import StorageUnavailableError
+from db.breaker import CLOSED, HALF_OPEN, OPEN, BreakerStorage, \
+    CircuitBreaker
+from models.genres import Genre
+from services import service
+
+
+class Storage:
+    def __init__(self, error: Exception = None, delay: float = 0):
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def get_by_id(self, _id: str, index: str, model):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return model(uuid=_id, name='Action')
+
+
+def _validation_error() -> ValidationError:
+    try:
+        Genre(uuid='1')
+    except ValidationError as err:
+        return err
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.failure()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+        breaker.failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0,
+                                 half_open_max_calls=1)
+        breaker.failure()
+
+        # Через reset_timeout пропускается только один пробный запрос
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_half_open_failure(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+        for _ in range(5):
+            breaker.failure()
+        assert breaker.allow()
+
+        # Ошибки пробного запроса достаточно, чтобы снова разомкнуть цепь
+        breaker.failure()
+        assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+class TestBreakerStorage:
+    async def test_storage_error(self):
+        error = ConnectionError('N/A', 'down', OSError())
+        storage = BreakerStorage(Storage(error), CircuitBreaker(1, 60),
+                                 timeout=1)
+
+        with pytest.raises(StorageUnavailableError):
+            await storage.get_by_id('1', 'genres', Genre)
+        assert storage.breaker.state == OPEN
+
+        # Разомкнутая цепь отклоняет запрос, не обращаясь к хранилищу
+        with pytest.raises(StorageUnavailableError):
+            await storage.get_by_id('1', 'genres', Genre)
+        assert storage.storage.calls == 1
+
+    async def test_timeout(self):
+        storage = BreakerStorage(Storage(delay=1), CircuitBreaker(1, 60),
+                                 timeout=0.01)
+
+        with pytest.raises(StorageUnavailableError):
+            await storage.get_by_id('1', 'genres', Genre)
+        assert storage.breaker.state == OPEN
+
+    async def test_other_error(self):
+        storage = BreakerStorage(Storage(_validation_error()),
+                                 CircuitBreaker(1, 60), timeout=1)
+
+        # Некорректный документ не говорит о недоступности хранилища
+        with pytest.raises(ValidationError):
+            await storage.get_by_id('1', 'genres', Genre)
+        assert storage.breaker.state == CLOSED
+
+    async def test_cancelled_probe(self):
+        breaker = CircuitBreaker(1, reset_timeout=0)
+        breaker.failure()
+        storage = BreakerStorage(Storage(delay=1), breaker, timeout=5)
+
+        probe = asyncio.create_task(storage.get_by_id('1', 'genres', Genre))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # Место отмененного пробного запроса досталось следующему
+        storage.storage.delay = 0
+        genre = await storage.get_by_id('1', 'genres', Genre)
+        assert genre.id == '1'
+        assert breaker.state == CLOSED
+
+
+class TestKeep:
+    def test_keep(self, monkeypatch):
+        monkeypatch.setattr(settings, 'cache_stale_in_seconds', 120)
+        assert service._keep(None, 'key')
+
+    def test_keep_disabled(self, monkeypatch):
+        # Продление на 0 секунд удалило бы запись
+        monkeypatch.setattr(settings, 'cache_stale_in_seconds', 0)
+        assert service._keep(None, 'key') is None
@@ -0,0 +1,37 @@
+from random import Random
+
+import orjson
+import pytest
+
+from db.codec import HEADERS, Codec
+
+DATA = orjson.dumps([{'id': str(i), 'name': 'Action'} for i in range(100)])
+
+
+class TestCodec:
+    def test_zlib(self):
+        codec = Codec('zlib', threshold=100, level=3)
+        encoded = codec.encode(DATA)
+
+        assert encoded[:1] == HEADERS['zlib']
+        assert len(encoded) < len(DATA)
+        assert codec.decode(encoded) == DATA
+        assert codec.ratio > 1
+
+    @pytest.mark.parametrize('data', [b'{"id": "1"}',
+                                      Random(0).randbytes(200)],
+                             ids=['short', 'incompressible'])
+    def test_stored_as_is(self, data):
+        # Короткие и несжимаемые записи не сжимаются
+        codec = Codec('zlib', threshold=100, level=3)
+
+        assert codec.encode(data) == data
+
+    def test_none(self):
+        # Сжатые записи читаются и с выключенным сжатием
+        encoded = Codec('zlib', threshold=0, level=3).encode(DATA)
+        codec = Codec('none', threshold=0, level=3)
+
+        assert codec.encode(DATA) == DATA
+        assert codec.decode(encoded) == DATA
+        assert codec.decode(DATA) == DATA
@@ -0,0 +1,96 @@
+import pytest
+from elasticsearch import NotFoundError, TransportError
+
+from db.elastic import Elastic
+from models.films import Film
+
+pytestmark = pytest.mark.asyncio
+
+
+def _hits(*ids: str) -> dict:
+    return {'hits': {'hits': [{'_source': {'id': _id, 'title': _id}}
+                              for _id in ids]}}
+
+
+class Session:
+    def __init__(self, responses: list[dict]):
+        self.responses = responses
+        self.closed = []
+
+    async def msearch(self, body: list[dict]) -> dict:
+        return {'responses': self.responses}
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict:
+        return {'id': 'pit'}
+
+    async def search(self, size: int, **params) -> dict:
+        docs = self.responses.pop(0)
+        for i, hit in enumerate(docs['hits']['hits']):
+            hit['sort'] = [i]
+        return docs
+
+    async def close_point_in_time(self, body: dict):
+        self.closed.append(body['id'])
+
+
+class ExpiredSession(Session):
+    async def close_point_in_time(self, body: dict):
+        raise NotFoundError(404, 'search_context_missing_exception', {})
+
+
+def _elastic(session) -> Elastic:
+    elastic = Elastic()
+    elastic.session = session
+    return elastic
+
+
+class TestGetLists:
+    async def test_get_lists(self):
+        elastic = _elastic(Session([_hits('1', '2'), _hits()]))
+
+        lists = await elastic.get_lists(Film, 'movies', [{}, {}], 10)
+
+        assert [[film.id for film in films] for films in lists] == \
+               [['1', '2'], []]
+
+    async def test_failed_search(self):
+        # Отказ шарда не должен выглядеть как персона без фильмов
+        error = {'error': {'type': 'search_phase_execution_exception'},
+                 'status': 503}
+        elastic = _elastic(Session([_hits('1'), error]))
+
+        with pytest.raises(TransportError):
+            await elastic.get_lists(Film, 'movies', [{}, {}], 10)
+
+
+class TestGetPage:
+    async def test_next_page(self):
+        session = Session([_hits('1', '2', '3')])
+
+        films, cursor = await _elastic(session).get_page(Film, 'movies',
+                                                         size=2)
+
+        assert [film.id for film in films] == ['1', '2']
+        assert cursor
+        assert session.closed == []
+
+    async def test_last_page(self):
+        # Страница ровно из size документов - последняя
+        session = Session([_hits('1', '2')])
+
+        films, cursor = await _elastic(session).get_page(Film, 'movies',
+                                                         size=2)
+
+        assert [film.id for film in films] == ['1', '2']
+        assert cursor is None
+        assert session.closed == ['pit']
+
+    async def test_close_error(self):
+        # Point in time истек раньше, чем его закрыли
+        session = ExpiredSession([_hits('1')])
+
+        films, cursor = await _elastic(session).get_page(Film, 'movies',
+                                                         size=2)
+
+        assert [film.id for film in films] == ['1']
+        assert cursor is None
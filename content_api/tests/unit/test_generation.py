@@ -0,0 +1,55 @@
+import pytest
+
+from api.v1 import _get_cache_key
+from db import redis
+from models.genres import Genre
+from services.service import IdRequestService
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def storage() -> Storage:
+    return Storage({'genres': {'789': {'id': '789', 'name': 'Action'}}})
+
+
+class TestGeneration:
+    async def test_cache_key(self, cache, monkeypatch):
+        monkeypatch.setattr(redis, 'redis', cache)
+        key = await _get_cache_key({'page': 1, 'sort': None}, 'genres')
+
+        assert key == await _get_cache_key({'page': 1}, 'genres')
+        await cache.incr_generation('genres')
+        assert key != await _get_cache_key({'page': 1}, 'genres')
+
+    async def test_by_id(self, cache, storage):
+        service = IdRequestService(cache, storage, Genre)
+        await service.process_by_id('789', 'genres')
+        genre = await service.process_by_id('789', 'genres')
+
+        assert genre.name == 'Action'
+        assert storage.calls == 1
+
+        # Перестроенный индекс отдает документ в новом виде
+        storage.docs['genres']['789']['name'] = 'Drama'
+        await cache.incr_generation('genres')
+        genre = await service.process_by_id('789', 'genres')
+
+        assert genre.name == 'Drama'
+        assert storage.calls == 2
+
+    async def test_by_ids(self, cache, storage):
+        service = IdRequestService(cache, storage, Genre)
+        await service.process_by_ids(['789'], 'genres')
+        genres = await service.process_by_ids(['789'], 'genres')
+
+        assert [genre.name for genre in genres] == ['Action']
+        assert storage.calls == 1
+
+        storage.docs['genres']['789']['name'] = 'Drama'
+        await cache.incr_generation('genres')
+        genres = await service.process_by_ids(['789'], 'genres')
+
+        assert [genre.name for genre in genres] == ['Drama']
+        assert storage.calls == 2
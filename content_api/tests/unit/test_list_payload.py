@@ -0,0 +1,48 @@
+import orjson
+import pytest
+
+from models.genres import Genre
+from services.service import ListService
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+
+def _serialize(genres: list[Genre]) -> bytes:
+    return orjson.dumps([genre.name for genre in genres])
+
+
+@pytest.fixture
+def storage() -> Storage:
+    return Storage({'genres': {'789': {'id': '789', 'name': 'Action'}}})
+
+
+class TestListPayload:
+    async def test_hit(self, cache, storage):
+        service = ListService(cache, storage, Genre)
+        await service.process_list_payload(_serialize, 'genres', key='all')
+        payload = await service.process_list_payload(_serialize, 'genres',
+                                                     key='all')
+
+        assert payload == b'["Action"]'
+        assert storage.calls == 1
+
+    async def test_invalidate(self, cache, storage):
+        service = ListService(cache, storage, Genre)
+        await service.process_list_payload(_serialize, 'genres', key='all')
+
+        # Тело ответа помечено id сущностей списка
+        storage.docs['genres']['789']['name'] = 'Drama'
+        await cache.invalidate_tags(['genres:789'])
+        payload = await service.process_list_payload(_serialize, 'genres',
+                                                     key='all')
+
+        assert payload == b'["Drama"]'
+        assert storage.calls == 2
+
+    async def test_without_key(self, cache, storage):
+        service = ListService(cache, storage, Genre)
+        await service.process_list_payload(_serialize, 'genres')
+        await service.process_list_payload(_serialize, 'genres')
+
+        assert storage.calls == 2
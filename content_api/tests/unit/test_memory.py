@@ -0,0 +1,43 @@
+import pytest
+
+from db.memory import MemoryCache
+from models.genres import Genre
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def memory(cache) -> MemoryCache:
+    return MemoryCache(cache, expire=60, max_items=100, max_bytes=10000)
+
+
+class TestMemoryCache:
+    async def test_local_hit(self, cache, memory):
+        await memory.put_to_cache_by_id(Genre(id='789', name='Action'))
+        await cache.session.flushall()
+
+        genre = await memory.get_from_cache_by_id('789', Genre)
+        assert genre.name == 'Action'
+
+    async def test_lru(self, cache):
+        memory = MemoryCache(cache, expire=60, max_items=2, max_bytes=10000)
+        for _id in ('1', '2', '3'):
+            await memory.put_to_cache_by_id(Genre(id=_id, name='Action'))
+
+        assert memory._get('1') is None
+        assert [memory._get(_id).id for _id in ('2', '3')] == ['2', '3']
+
+    async def test_invalidate(self, memory):
+        await memory.put_to_cache_by_id(Genre(id='1', name='Action'))
+        await memory.put_to_cache_by_id(Genre(id='2', name='Drama'))
+
+        # Свои сообщения и мусор в канале записи не удаляют
+        memory._invalidate(f'{memory._worker_id}:1'.encode())
+        memory._invalidate(b'\xff')
+        memory._invalidate(None)
+        assert memory._get('1') and memory._get('2')
+
+        # Другой воркер перезаписал оба ключа
+        memory._invalidate(b'other:1\n2')
+        assert memory._get('1') is None
+        assert memory._get('2') is None
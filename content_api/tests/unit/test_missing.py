@@ -0,0 +1,43 @@
+import pytest
+
+from db.redis import MISSING_KEY
+from models.genres import Genre
+from services.service import IdRequestService
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestMissing:
+    async def test_second_lookup(self, cache):
+        storage = Storage()
+        service = IdRequestService(cache, storage, Genre)
+
+        assert await service.process_by_id('789', 'genres') is None
+        assert await service.process_by_id('789', 'genres') is None
+        # Второй запрос отвечен отметкой об отсутствии
+        assert storage.calls == 1
+
+    async def test_invalidate_clears_missing(self, cache):
+        storage = Storage()
+        service = IdRequestService(cache, storage, Genre)
+        await service.process_by_id('789', 'genres')
+
+        storage.docs['genres'] = {'789': {'id': '789', 'name': 'Action'}}
+        await cache.invalidate_tags(['genres:789'])
+        genre = await service.process_by_id('789', 'genres')
+
+        assert genre.name == 'Action'
+        assert storage.calls == 2
+
+    async def test_etl_clears_missing(self, cache):
+        storage = Storage()
+        service = IdRequestService(cache, storage, Genre)
+        await service.process_by_id('789', 'genres')
+
+        # Так отметку снимает ETL, загрузив документ
+        storage.docs['genres'] = {'789': {'id': '789', 'name': 'Action'}}
+        await cache.session.zrem(MISSING_KEY, 'genres:789')
+        genre = await service.process_by_id('789', 'genres')
+
+        assert genre.name == 'Action'
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from models.genres import Genre
+from services.service import IdRequestService
+from services.single_flight import SingleFlight
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def lock_enabled(monkeypatch):
+    monkeypatch.setattr(settings, 'cache_lock_enabled', True)
+    monkeypatch.setattr(settings, 'cache_lock_timeout', 5)
+    monkeypatch.setattr(settings, 'cache_lock_poll_interval', 0.01)
+
+
+class TestSingleFlight:
+    async def test_coalesce(self, cache):
+        flight = SingleFlight(cache)
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        res = await asyncio.gather(*[flight.do('key', load)
+                                     for _ in range(10)])
+
+        assert res == [1] * 10
+        assert calls == 1
+
+
+@pytest.mark.usefixtures('lock_enabled')
+class TestWait:
+    async def test_missing(self, cache):
+        # Блокировку держит другой воркер, который не найдет документ
+        lock = await cache.lock('genres:789')
+        storage = Storage()
+        service = IdRequestService(cache, storage, Genre)
+        task = asyncio.ensure_future(service.process_by_id('789', 'genres'))
+        await asyncio.sleep(0.05)
+        await cache.put_missing('genres:789', 30)
+
+        assert await asyncio.wait_for(task, 1) is None
+        assert storage.calls == 0
+        await cache.unlock(lock)
+
+    async def test_released(self, cache):
+        # Другой воркер отпустил блокировку, не положив ничего в кэш
+        lock = await cache.lock('genres:789')
+        storage = Storage({'genres': {'789': {'id': '789',
+                                              'name': 'Action'}}})
+        service = IdRequestService(cache, storage, Genre)
+        task = asyncio.ensure_future(service.process_by_id('789', 'genres'))
+        await asyncio.sleep(0.05)
+        await cache.unlock(lock)
+
+        genre = await asyncio.wait_for(task, 1)
+        assert genre.name == 'Action'
+        assert storage.calls == 1
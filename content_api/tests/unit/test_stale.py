@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from db import StorageUnavailableError
+from models.genres import Genre
+from services.service import IdRequestService
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+KEY = 'genres:0:789'
+
+
+@pytest.fixture
+def storage(monkeypatch) -> Storage:
+    monkeypatch.setattr(settings, 'cache_stale_in_seconds', 60)
+    return Storage({'genres': {'789': {'id': '789', 'name': 'Action'}}})
+
+
+async def _make_stale(cache, service: IdRequestService):
+    await service.process_by_id('789', 'genres')
+    # Срок свежести истек 30 секунд назад, запись еще можно отдавать
+    await cache.session.expire(KEY, 30)
+
+
+async def _refreshed(service: IdRequestService):
+    await asyncio.gather(*service.flight._refreshes.values())
+
+
+class TestStaleWhileRevalidate:
+    async def test_refresh(self, cache, storage):
+        service = IdRequestService(cache, storage, Genre)
+        await _make_stale(cache, service)
+        storage.docs['genres']['789']['name'] = 'Drama'
+
+        # Устаревшая запись отдается сразу, а обновляется в фоне
+        genre = await service.process_by_id('789', 'genres')
+        assert genre.name == 'Action'
+        await _refreshed(service)
+
+        genre = await service.process_by_id('789', 'genres')
+        assert genre.name == 'Drama'
+        assert storage.calls == 2
+
+    async def test_storage_unavailable(self, cache, storage):
+        service = IdRequestService(cache, storage, Genre)
+        await _make_stale(cache, service)
+
+        async def get_by_id(*args):
+            raise StorageUnavailableError('Circuit is open')
+
+        storage.get_by_id = get_by_id
+        genre = await service.process_by_id('789', 'genres')
+        await _refreshed(service)
+
+        # Пока хранилище недоступно, устаревшая запись продлевается
+        assert genre.name == 'Action'
+        assert await cache.session.ttl(KEY) > 30
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from core.config import settings
+from db import redis
+from services import token as token_service
+
+pytestmark = pytest.mark.asyncio
+
+SECRET_KEY = 'secret'
+
+
+def _token(expires_in: float = 60, secret_key: str = SECRET_KEY) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    return jwt.encode({'sub': 'user', 'exp': expires}, secret_key,
+                      algorithm=token_service.ALGORITHM)
+
+
+@pytest.fixture
+def auth_calls(cache, monkeypatch) -> list:
+    # Роли отдает auth_api; считаем обращения к нему
+    calls = []
+
+    async def auth_request(method: str, url: str, token: str, **kwargs):
+        calls.append(url)
+        return {'roles': ['Admin']}
+
+    monkeypatch.setattr(settings, 'auth_local_verify', True)
+    monkeypatch.setattr(settings, 'secret_key', SECRET_KEY)
+    monkeypatch.setattr(redis, 'redis', cache)
+    monkeypatch.setattr(token_service, '_auth_request', auth_request)
+    monkeypatch.setattr(token_service, 'roles_cache', OrderedDict())
+    return calls
+
+
+class TestLocalVerify:
+    async def test_roles_cached(self, auth_calls):
+        await token_service.check_roles(_token(), 'admin')
+        await token_service.check_roles(_token(), 'manager admin')
+
+        assert auth_calls == ['/api/v1/users/me']
+
+    async def test_forbidden(self, auth_calls):
+        with pytest.raises(HTTPException) as err:
+            await token_service.check_roles(_token(), 'manager')
+        assert err.value.status_code == 403
+
+    @pytest.mark.parametrize('token', [
+        lambda: _token(expires_in=-60),
+        lambda: _token(secret_key='other'),
+        lambda: 'not a token',
+    ])
+    async def test_invalid(self, auth_calls, token):
+        with pytest.raises(HTTPException) as err:
+            await token_service.check_roles(token(), 'admin')
+        assert err.value.status_code == 401
+        assert auth_calls == []
+
+    async def test_revoked(self, cache, auth_calls):
+        token = _token()
+        await cache.session.set(f'invalid-access-token:{token}', 1)
+
+        with pytest.raises(HTTPException) as err:
+            await token_service.check_roles(token, 'admin')
+        assert err.value.status_code == 401
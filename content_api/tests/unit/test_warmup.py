@@ -0,0 +1,54 @@
+import asyncio
+
+import orjson
+import pytest
+
+from api.v1 import warmup
+from core.config import settings
+from models.genres import Genre
+from services.service import ListService
+from tests.unit.utils import Storage
+
+pytestmark = pytest.mark.asyncio
+
+
+def _serialize(genres: list[Genre]) -> bytes:
+    return orjson.dumps([genre.name for genre in genres])
+
+
+class TestRefreshAhead:
+    async def test_refresh_ahead(self, cache, monkeypatch):
+        monkeypatch.setattr(settings, 'cache_expire_in_seconds', 300)
+        storage = Storage({'genres': {'789': {'id': '789',
+                                              'name': 'Action'}}})
+        service = ListService(cache, storage, Genre)
+        await service.process_list_payload(_serialize, 'genres', key='all')
+
+        # Запись свежа дольше интервала прогрева и не обновляется
+        payload = await service.process_list_payload(_serialize, 'genres',
+                                                     key='all',
+                                                     refresh_ahead=240)
+        assert payload == b'["Action"]'
+        assert storage.calls == 1
+
+        # Запись устареет до следующего прогрева и обновляется сразу
+        storage.docs['genres']['789']['name'] = 'Drama'
+        payload = await service.process_list_payload(_serialize, 'genres',
+                                                     key='all',
+                                                     refresh_ahead=400)
+        assert payload == b'["Drama"]'
+        assert storage.calls == 2
+
+
+class TestCacheWarmer:
+    async def test_stop(self, monkeypatch):
+        async def warm():
+            await asyncio.sleep(10)
+
+        warmer = warmup.CacheWarmer()
+        monkeypatch.setattr(warmer, 'warm', warm)
+        warmer.start()
+        await asyncio.sleep(0)
+        await warmer.stop()
+
+        assert warmer._task.cancelled()
@@ -0,0 +1,26 @@
+class Storage:
+    """
+    Хранилище в памяти: {индекс: {id: документ}}. Считает запросы, чтобы
+    тесты проверяли, дошел ли запрос до хранилища.
+    """
+
+    def __init__(self, docs: dict[str, dict[str, dict]] = None):
+        self.docs = docs or {}
+        self.calls = 0
+
+    async def get_by_id(self, _id: str, index: str, model):
+        self.calls += 1
+        doc = self.docs.get(index, {}).get(_id)
+        return model(**doc) if doc else None
+
+    async def get_by_ids(self, ids: list[str], index: str, model,
+                         fields: list[str] = None) -> list:
+        self.calls += 1
+        docs = self.docs.get(index, {})
+        return [model(**docs[_id]) for _id in ids if _id in docs]
+
+    async def get_list(self, model, index: str, sort: str = None,
+                       search: dict = None, page: int = None,
+                       size: int = None, fields: list[str] = None) -> list:
+        self.calls += 1
+        return [model(**doc) for doc in self.docs.get(index, {}).values()]
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+from functools import wraps
+
+from core.config import settings
+
+
+def backoff(exceptions: tuple[type[Exception], ...],
+            start_sleep_time: float = None,
+            factor: float = None,
+            border_sleep_time: float = None):
+    """
+    Повторяет корутину при перечисленных ошибках, увеличивая паузу между
+    попытками в factor раз, но не больше border_sleep_time секунд.
+    """
+    start_sleep_time = start_sleep_time or \
+        settings.etl_backoff_start_in_seconds
+    factor = factor or settings.etl_backoff_factor
+    border_sleep_time = border_sleep_time or \
+        settings.etl_backoff_border_in_seconds
+
+    def func_wrapper(func):
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            sleep_time = start_sleep_time
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as err:
+                    logging.error(f'{func.__name__}: {err!r}, повтор через '
+                                  f'{sleep_time:.1f} с')
+                    await asyncio.sleep(sleep_time)
+                    sleep_time = min(sleep_time * factor, border_sleep_time)
+        return inner
+
+    return func_wrapper
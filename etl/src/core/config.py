@@ -0,0 +1,53 @@
+from logging import config as logging_config
+from pydantic import BaseSettings, Field
+
+from core.logger import LOGGING
+
+# Применяем настройки логирования
+logging_config.dictConfig(LOGGING)
+
+
+class Settings(BaseSettings):
+    db_name: str = Field(..., env='DB_NAME')
+    db_user: str = Field(..., env='DB_USER')
+    db_password: str = Field(..., env='DB_PASSWORD')
+    db_host: str = Field('127.0.0.1', env='DB_HOST')
+    db_port: int = Field(5432, env='DB_PORT')
+    pg_schema: str = Field('content', env='PG_SCHEMA')
+    elastic_host: str = Field(..., env='ELASTIC_HOST')
+    elastic_port: int = Field(..., env='ELASTIC_PORT')
+    # Redis content_api: поколения ключей кэша сбрасываются после
+    # перестроения индекса, а отметки об отсутствии документов снимаются
+    # при их загрузке
+    redis_host: str = Field(..., env='REDIS_HOST')
+    redis_port: int = Field(..., env='REDIS_PORT')
+    # Сколько измененных строк читается из курсора за раз и сколько
+    # документов собирается одним запросом
+    etl_batch_size: int = Field(500, env='ETL_BATCH_SIZE')
+    # Размер одного bulk-запроса и сколько их выполняется параллельно
+    etl_bulk_chunk_size: int = Field(250, env='ETL_BULK_CHUNK_SIZE')
+    etl_bulk_concurrency: int = Field(4, env='ETL_BULK_CONCURRENCY')
+    # Сколько раз повторять документы, отклоненные с 429
+    etl_bulk_max_retries: int = Field(3, env='ETL_BULK_MAX_RETRIES')
+    etl_interval_in_seconds: float = Field(60,
+                                           env='ETL_INTERVAL_IN_SECONDS')
+    # Файл с отметками modified, до которых данные уже загружены. Должен
+    # лежать на томе, чтобы после перезапуска продолжить с того же места
+    etl_state_file: str = Field('state/etl_state.json',
+                                env='ETL_STATE_FILE')
+    # Перестроение индекса копированием: параллельные срезы scroll и
+    # размер страницы каждого среза
+    etl_scroll_slices: int = Field(4, env='ETL_SCROLL_SLICES')
+    etl_scroll_size: int = Field(1000, env='ETL_SCROLL_SIZE')
+    etl_backoff_start_in_seconds: float = Field(
+        0.1, env='ETL_BACKOFF_START_IN_SECONDS')
+    etl_backoff_factor: float = Field(2, env='ETL_BACKOFF_FACTOR')
+    etl_backoff_border_in_seconds: float = Field(
+        10, env='ETL_BACKOFF_BORDER_IN_SECONDS')
+
+    class Config:
+        env_file = '.env'
+        env_file_encoding = 'utf-8'
+
+
+settings = Settings()
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+from elasticsearch import AsyncElasticsearch, ConnectionError, \
+    ConnectionTimeout
+from elasticsearch.helpers import async_bulk
+
+from core.backoff import backoff
+
+ES_ERRORS = (ConnectionError, ConnectionTimeout)
+
+
+class ElasticLoader:
+    """
+    Загрузка документов bulk-запросами по chunk_size документов, до
+    concurrency запросов одновременно.
+    """
+
+    def __init__(self,
+                 client: AsyncElasticsearch,
+                 chunk_size: int,
+                 concurrency: int,
+                 max_retries: int):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @backoff(ES_ERRORS)
+    async def create_indexes(self, schemas: dict):
+        for index, schema in schemas.items():
+            if not await self.client.indices.exists(index=index):
+                await self.client.indices.create(index=index, body=schema)
+                logging.info(f'Создан индекс {index}')
+            else:
+                # Новые поля схемы добавляются в существующий индекс, но
+                # заполняются только у документов, загруженных после этого.
+                # Заполнить их у всех документов и изменить прежние поля
+                # можно через reindex.py
+                await self.client.indices.put_mapping(
+                    index=index, body=schema['mappings'])
+
+    @backoff(ES_ERRORS)
+    async def _bulk(self, index: str, docs: list[dict]) -> int:
+        actions = [{'_index': index, '_id': doc['id'], '_source': doc}
+                   for doc in docs]
+        async with self._semaphore:
+            # Документы, отклоненные из-за перегрузки (429), async_bulk
+            # повторяет сам с нарастающей паузой
+            success, errors = await async_bulk(self.client,
+                                               actions,
+                                               chunk_size=self.chunk_size,
+                                               max_retries=self.max_retries,
+                                               raise_on_error=False)
+        for error in errors:
+            logging.error(f'Документ не загружен в {index}: {error}')
+        return success
+
+    async def load(self, index: str, docs: list[dict]) -> int:
+        chunks = [docs[i:i + self.chunk_size]
+                  for i in range(0, len(docs), self.chunk_size)]
+        loaded = await asyncio.gather(*(self._bulk(index, chunk)
+                                        for chunk in chunks))
+        return sum(loaded)
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,56 @@
+from typing import AsyncIterator
+
+import asyncpg
+import orjson
+
+from core.backoff import backoff
+from core.config import settings
+from queries import CHANGED
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    # jsonb-агрегаты сразу разбираются в списки словарей
+    await conn.set_type_codec('jsonb',
+                              encoder=lambda v: orjson.dumps(v).decode(),
+                              decoder=orjson.loads,
+                              schema='pg_catalog')
+
+
+@backoff((OSError, asyncpg.PostgresConnectionError))
+async def create_pool() -> asyncpg.Pool:
+    # Одно соединение держит курсор, второе собирает документы
+    return await asyncpg.create_pool(database=settings.db_name,
+                                     user=settings.db_user,
+                                     password=settings.db_password,
+                                     host=settings.db_host,
+                                     port=settings.db_port,
+                                     min_size=2,
+                                     max_size=2,
+                                     init=_init_connection)
+
+
+class PostgresExtractor:
+    def __init__(self, pool: asyncpg.Pool, batch_size: int):
+        self.pool = pool
+        self.batch_size = batch_size
+
+    async def changed(self, table: str, column: str,
+                      since: tuple) -> AsyncIterator[list[asyncpg.Record]]:
+        """
+        Пачки строк таблицы, измененных после отметки since, в порядке
+        изменения. Строки читаются серверным курсором, поэтому в памяти
+        не бывает больше одной пачки.
+        """
+        query = CHANGED.format(schema=settings.pg_schema,
+                               table=table,
+                               column=column)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(isolation='repeatable_read',
+                                        readonly=True):
+                cursor = await conn.cursor(query, *since)
+                while rows := await cursor.fetch(self.batch_size):
+                    yield rows
+
+    async def fetch(self, query: str, ids: list) -> list[asyncpg.Record]:
+        async with self.pool.acquire() as conn:
+            return await conn.fetch(query, ids)
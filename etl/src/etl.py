@@ -0,0 +1,101 @@
+import logging
+from time import perf_counter
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from db.elastic import ElasticLoader
+from db.postgres import PostgresExtractor
+from queries import DOCUMENTS, Source
+from state import State
+
+# Sorted set отметок content_api о том, что документа нет в индексе.
+# Элементы - '<индекс>:<id>'
+MISSING_KEY = 'missing'
+
+
+class Throughput:
+    """Сколько документов загружено и за сколько секунд."""
+
+    def __init__(self):
+        self.docs = 0
+        self.started = perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return perf_counter() - self.started
+
+    def __str__(self) -> str:
+        seconds = self.seconds
+        rate = self.docs / seconds if seconds else 0
+        return f'{self.docs} док. за {seconds:.1f} с ({rate:.0f} док/с)'
+
+
+class ETL:
+    def __init__(self,
+                 extractor: PostgresExtractor,
+                 loader: ElasticLoader,
+                 state: State,
+                 batch_size: int,
+                 targets: dict[str, str] = None,
+                 cache: Redis = None):
+        """
+        :param targets: в какой индекс загружать документы индекса, если
+        не в одноименный. Нужно при перестроении индекса
+        :param cache: Redis content_api, в котором снимаются отметки об
+        отсутствии загруженных документов
+        """
+        self.extractor = extractor
+        self.loader = loader
+        self.state = state
+        self.batch_size = batch_size
+        self.targets = targets or {}
+        self.cache = cache
+
+    async def _forget_missing(self, index: str, ids: list):
+        # Новый документ иначе отдавался бы как несуществующий, пока не
+        # истечет отметка
+        if not self.cache or not ids:
+            return
+        try:
+            await self.cache.zrem(MISSING_KEY,
+                                  *[f'{index}:{_id}' for _id in ids])
+        except RedisError as err:
+            # Отметки истекают сами, загрузку из-за них не прерываем
+            logging.warning(f'Не удалось снять отметки об отсутствии: '
+                            f'{err!r}')
+
+    async def _load_documents(self, index: str, ids: list) -> int:
+        loaded = 0
+        for i in range(0, len(ids), self.batch_size):
+            rows = await self.extractor.fetch(DOCUMENTS[index],
+                                              ids[i:i + self.batch_size])
+            loaded += await self.loader.load(self.targets.get(index, index),
+                                             [dict(row) for row in rows])
+            await self._forget_missing(index, [row['id'] for row in rows])
+        return loaded
+
+    async def process(self, source: Source) -> Throughput:
+        key = f'{source.index}.{source.table}'
+        throughput = Throughput()
+        since = self.state.get_watermark(key)
+        async for batch in self.extractor.changed(source.table,
+                                                  source.column,
+                                                  since):
+            ids = [row['id'] for row in batch]
+            if source.fan_out:
+                ids = [row['id'] for row in
+                       await self.extractor.fetch(source.fan_out, ids)]
+            throughput.docs += await self._load_documents(source.index, ids)
+            last = batch[-1]
+            self.state.set_watermark(key, last['modified'], last['id'])
+        if throughput.docs:
+            logging.info(f'{key}: {throughput}')
+        return throughput
+
+    async def run(self, sources: list[Source]) -> Throughput:
+        total = Throughput()
+        for source in sources:
+            total.docs += (await self.process(source)).docs
+        logging.info(f'Загрузка завершена: {total}')
+        return total
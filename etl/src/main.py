@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+import asyncpg
+from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+
+from core.backoff import backoff
+from core.config import settings
+from db.elastic import ES_ERRORS, ElasticLoader
+from db.es_schemas import schemas
+from db.postgres import PostgresExtractor, create_pool
+from etl import ETL
+from queries import SOURCES
+from state import JsonFileStorage, State
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+async def main():
+    state = State(JsonFileStorage(settings.etl_state_file))
+    pool = await create_pool()
+    loader = ElasticLoader(
+        AsyncElasticsearch(
+            hosts=[f'{settings.elastic_host}:{settings.elastic_port}']),
+        chunk_size=settings.etl_bulk_chunk_size,
+        concurrency=settings.etl_bulk_concurrency,
+        max_retries=settings.etl_bulk_max_retries)
+    cache = Redis(host=settings.redis_host, port=settings.redis_port)
+    etl = ETL(PostgresExtractor(pool, settings.etl_batch_size),
+              loader,
+              state,
+              settings.etl_batch_size,
+              cache=cache)
+
+    # При потере соединения цикл начинается заново с сохраненных отметок
+    @backoff((OSError, asyncpg.PostgresConnectionError,
+              asyncpg.InterfaceError) + ES_ERRORS)
+    async def run():
+        await etl.run(SOURCES)
+
+    try:
+        await loader.create_indexes(schemas)
+        while True:
+            await run()
+            await asyncio.sleep(settings.etl_interval_in_seconds)
+    finally:
+        await loader.close()
+        await pool.close()
+        await cache.close()
+
+
+if __name__ == '__main__':
+    if uvloop:
+        uvloop.install()
+    logging.info('ETL запущен')
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+from typing import NamedTuple
+
+from core.config import settings
+
+SCHEMA = settings.pg_schema
+
+# Строки таблицы, измененные после отметки. Сравнение пар (modified, id)
+# не теряет строки с одинаковым modified на границе пачек
+CHANGED = """
+SELECT id, {column} AS modified
+FROM {schema}.{table}
+WHERE ({column}, id) > ($1::timestamptz, $2::uuid)
+ORDER BY {column}, id
+"""
+
+FILMS_BY_GENRES = f"""
+SELECT DISTINCT film_work_id AS id
+FROM {SCHEMA}.genre_film_work
+WHERE genre_id = ANY($1::uuid[])
+"""
+
+FILMS_BY_PERSONS = f"""
+SELECT DISTINCT film_work_id AS id
+FROM {SCHEMA}.person_film_work
+WHERE person_id = ANY($1::uuid[])
+"""
+
+FILMS_BY_LINKS = f"""
+SELECT DISTINCT film_work_id AS id
+FROM {SCHEMA}.{{table}}
+WHERE id = ANY($1::uuid[])
+"""
+
+
+def _persons(role: str) -> str:
+    return f"""
+    COALESCE(jsonb_agg(DISTINCT jsonb_build_object('id', p.id::text,
+                                                   'name', p.full_name))
+             FILTER (WHERE pfw.role = '{role}'), '[]') AS {role}s,
+    COALESCE(array_agg(DISTINCT p.id::text)
+             FILTER (WHERE pfw.role = '{role}'), '{{}}') AS {role}s_ids
+    """
+
+
+# Документы индекса movies собираются одним запросом на пачку фильмов
+MOVIES = f"""
+SELECT
+    fw.id::text AS id,
+    fw.title,
+    fw.description,
+    fw.rating AS imdb_rating,
+    COALESCE(jsonb_agg(DISTINCT jsonb_build_object('id', g.id::text,
+                                                   'name', g.name))
+             FILTER (WHERE g.id IS NOT NULL), '[]') AS genre,
+    {_persons('director')},
+    {_persons('actor')},
+    {_persons('writer')},
+    COALESCE(array_agg(DISTINCT p.full_name)
+             FILTER (WHERE pfw.role = 'actor'), '{{}}') AS actors_names,
+    COALESCE(array_agg(DISTINCT p.full_name)
+             FILTER (WHERE pfw.role = 'writer'), '{{}}') AS writers_names,
+    COALESCE(array_agg(DISTINCT p.id::text)
+             FILTER (WHERE p.id IS NOT NULL), '{{}}') AS person_ids,
+    -- Документ меняется вместе с жанрами, персонами и связями с ними
+    GREATEST(fw.modified, MAX(g.modified), MAX(p.modified),
+             MAX(gfw.created), MAX(pfw.created)) AS modified
+FROM {SCHEMA}.film_work fw
+LEFT JOIN {SCHEMA}.genre_film_work gfw ON gfw.film_work_id = fw.id
+LEFT JOIN {SCHEMA}.genre g ON g.id = gfw.genre_id
+LEFT JOIN {SCHEMA}.person_film_work pfw ON pfw.film_work_id = fw.id
+LEFT JOIN {SCHEMA}.person p ON p.id = pfw.person_id
+WHERE fw.id = ANY($1::uuid[])
+GROUP BY fw.id
+"""
+
+GENRES = f"""
+SELECT id::text AS id, name, description
+FROM {SCHEMA}.genre
+WHERE id = ANY($1::uuid[])
+"""
+
+PERSONS = f"""
+SELECT id::text AS id, full_name
+FROM {SCHEMA}.person
+WHERE id = ANY($1::uuid[])
+"""
+
+DOCUMENTS = {'movies': MOVIES, 'genres': GENRES, 'persons': PERSONS}
+
+
+class Source(NamedTuple):
+    # Индекс, документы которого зависят от таблицы
+    index: str
+    table: str
+    # Колонка с временем изменения строки. В связующих таблицах есть только
+    # created, поэтому удаление связи без изменения фильма не замечается
+    column: str = 'modified'
+    # Запрос, переводящий id измененных строк в id документов индекса.
+    # None - id строк и есть id документов
+    fan_out: str | None = None
+
+
+SOURCES = [
+    Source('genres', 'genre'),
+    Source('persons', 'person'),
+    Source('movies', 'film_work'),
+    Source('movies', 'genre', fan_out=FILMS_BY_GENRES),
+    Source('movies', 'person', fan_out=FILMS_BY_PERSONS),
+    Source('movies', 'genre_film_work', 'created',
+           FILMS_BY_LINKS.format(table='genre_film_work')),
+    Source('movies', 'person_film_work', 'created',
+           FILMS_BY_LINKS.format(table='person_film_work')),
+]
+
+# Полная загрузка индекса: все документы по основной таблице
+FULL_SOURCES = {
+    'movies': Source('movies', 'film_work'),
+    'genres': Source('genres', 'genre'),
+    'persons': Source('persons', 'person'),
+}
@@ -0,0 +1,255 @@
+"""
+Перестроение индекса без простоя: документы загружаются в новый индекс
+с версией в имени, а псевдоним, по которому читает content_api, атомарно
+переключается на него. Изменения, которые работающий ETL за это время
+записал в прежний индекс, догружаются в новый до и после переключения.
+
+    python reindex.py movies                 # из Postgres
+    python reindex.py movies --source index  # копия текущего индекса
+"""
+import argparse
+import asyncio
+import copy
+import logging
+from datetime import datetime
+from time import time
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
+from redis.asyncio import Redis
+
+from core.config import settings
+from db.elastic import ElasticLoader
+from db.es_schemas import schemas
+from db.postgres import PostgresExtractor, create_pool
+from etl import ETL, Throughput
+from queries import FULL_SOURCES, SOURCES
+from state import MIN_ID, JsonFileStorage, MemoryStorage, State
+
+# Канал, по которому воркеры content_api сбрасывают локальные копии ключей
+INVALIDATE_CHANNEL = 'cache:invalidate'
+# Время одного запроса force merge
+FORCEMERGE_TIMEOUT = 3600
+
+
+class Reindexer:
+    def __init__(self,
+                 client: AsyncElasticsearch,
+                 loader: ElasticLoader,
+                 scroll_slices: int,
+                 scroll_size: int):
+        self.client = client
+        self.loader = loader
+        self.scroll_slices = scroll_slices
+        self.scroll_size = scroll_size
+
+    async def create(self, alias: str) -> str:
+        """
+        Создает пустой индекс с версией в имени. Пока идет загрузка, индекс
+        не обновляется для поиска и не держит реплик.
+        :return: имя нового индекса
+        """
+        name = f'{alias}_{int(time())}'
+        schema = copy.deepcopy(schemas[alias])
+        schema['settings'].update({'refresh_interval': '-1',
+                                   'number_of_replicas': 0})
+        await self.client.indices.create(index=name, body=schema)
+        logging.info(f'Создан индекс {name}')
+        return name
+
+    async def _copy_slice(self, alias: str, name: str, _slice: int) -> int:
+        loaded = 0
+        docs = []
+        query = {'query': {'match_all': {}}}
+        if self.scroll_slices > 1:
+            query['slice'] = {'id': _slice, 'max': self.scroll_slices}
+        async for hit in async_scan(self.client,
+                                    index=alias,
+                                    query=query,
+                                    size=self.scroll_size):
+            docs.append(hit['_source'])
+            if len(docs) >= self.scroll_size:
+                loaded += await self.loader.load(name, docs)
+                docs = []
+        if docs:
+            loaded += await self.loader.load(name, docs)
+        return loaded
+
+    async def copy(self, alias: str, name: str) -> Throughput:
+        """Копирует документы текущего индекса параллельными срезами."""
+        throughput = Throughput()
+        loaded = await asyncio.gather(*(self._copy_slice(alias, name, i)
+                                        for i in range(self.scroll_slices)))
+        throughput.docs = sum(loaded)
+        return throughput
+
+    async def _live_replicas(self, alias: str) -> int:
+        if not await self.client.indices.exists(index=alias):
+            return 1
+        live = await self.client.indices.get_settings(index=alias)
+        return int(next(iter(live.values()))['settings']['index']
+                   .get('number_of_replicas', 1))
+
+    async def finish(self, alias: str, name: str):
+        """Возвращает настройки индекса и сливает сегменты."""
+        await self.client.indices.put_settings(
+            index=name,
+            body={'index': {
+                'refresh_interval':
+                    schemas[alias]['settings'].get('refresh_interval', '1s'),
+                'number_of_replicas': await self._live_replicas(alias)}})
+        await self.client.indices.refresh(index=name)
+        await self.client.indices.forcemerge(
+            index=name,
+            max_num_segments=1,
+            request_timeout=FORCEMERGE_TIMEOUT)
+
+    async def swap(self, alias: str, name: str) -> list[str]:
+        """
+        Одним запросом переводит псевдоним на новый индекс. Индекс, который
+        назывался так же, как псевдоним, удаляется тем же запросом.
+        :return: индексы, на которые псевдоним указывал раньше
+        """
+        actions = [{'add': {'index': name, 'alias': alias}}]
+        old = []
+        if await self.client.indices.exists_alias(name=alias):
+            old = list(await self.client.indices.get_alias(name=alias))
+            actions += [{'remove': {'index': index, 'alias': alias}}
+                        for index in old]
+        elif await self.client.indices.exists(index=alias):
+            actions.append({'remove_index': {'index': alias}})
+        await self.client.indices.update_aliases(body={'actions': actions})
+        logging.info(f'Псевдоним {alias} указывает на {name}')
+        return old
+
+
+def _alias_sources(alias: str) -> list:
+    return [source for source in SOURCES if source.index == alias]
+
+
+def _state_keys(alias: str) -> list[str]:
+    return [f'{source.index}.{source.table}'
+            for source in _alias_sources(alias)]
+
+
+def _watermarks(alias: str, modified: datetime) -> dict:
+    # Отметки в том же виде, в каком их хранит State
+    return {key: {'modified': modified.isoformat(), 'id': MIN_ID}
+            for key in _state_keys(alias)}
+
+
+def _live_watermarks(alias: str) -> dict:
+    """
+    Отметки работающего ETL: до них изменения уже есть в текущем индексе,
+    а значит, и в его копии. Таблица без отметки догружается целиком.
+    """
+    live = State(JsonFileStorage(settings.etl_state_file)).state
+    return {key: live[key] for key in _state_keys(alias) if key in live}
+
+
+async def _catch_up(alias: str, name: str, extractor: PostgresExtractor,
+                    loader: ElasticLoader, watermarks: dict) -> Throughput:
+    """
+    Дописывает в новый индекс изменения, сделанные после отметок, так же,
+    как это делает инкрементальный ETL. Пока псевдоним не переключен,
+    работающий ETL пишет их только в прежний индекс.
+    """
+    return await ETL(extractor,
+                     loader,
+                     State(MemoryStorage(dict(watermarks))),
+                     settings.etl_batch_size,
+                     {alias: name}).run(_alias_sources(alias))
+
+
+async def _load_from_postgres(alias: str, name: str,
+                              extractor: PostgresExtractor,
+                              loader: ElasticLoader) -> Throughput:
+    return await ETL(extractor,
+                     loader,
+                     State(MemoryStorage()),
+                     settings.etl_batch_size,
+                     {alias: name}).process(FULL_SOURCES[alias])
+
+
+async def _bump_generation(alias: str):
+    # Все ключи кэша content_api, и списков, и записей по id, включают
+    # поколение индекса: после переключения они читаются из нового индекса
+    redis = Redis(host=settings.redis_host, port=settings.redis_port)
+    try:
+        generation = await redis.incr(f'generation:{alias}')
+        await redis.publish(INVALIDATE_CHANNEL,
+                            f'reindex:generation:{alias}')
+    finally:
+        await redis.close()
+    logging.info(f'Поколение кэша {alias}: {generation}')
+
+
+async def main(args: argparse.Namespace):
+    client = AsyncElasticsearch(
+        hosts=[f'{settings.elastic_host}:{settings.elastic_port}'])
+    loader = ElasticLoader(client,
+                           chunk_size=settings.etl_bulk_chunk_size,
+                           concurrency=settings.etl_bulk_concurrency,
+                           max_retries=settings.etl_bulk_max_retries)
+    reindexer = Reindexer(client,
+                          loader,
+                          scroll_slices=settings.etl_scroll_slices,
+                          scroll_size=settings.etl_scroll_size)
+    alias = args.index
+    pool = await create_pool()
+    extractor = PostgresExtractor(pool, settings.etl_batch_size)
+
+    async def now() -> datetime:
+        return await pool.fetchval('SELECT now()')
+
+    try:
+        name = await reindexer.create(alias)
+        try:
+            if args.source == 'index':
+                # Копия содержит все, что ETL успел загрузить до ее начала
+                since = _live_watermarks(alias)
+                throughput = await reindexer.copy(alias, name)
+            else:
+                since = _watermarks(alias, await now())
+                throughput = await _load_from_postgres(alias, name,
+                                                       extractor, loader)
+            logging.info(f'Загружено в {name}: {throughput}')
+
+            # Изменения за время загрузки, затем за время finish, который
+            # может длиться до FORCEMERGE_TIMEOUT. Вторая догрузка короткая,
+            # поэтому до переключения почти ничего не накапливается
+            mark = await now()
+            await _catch_up(alias, name, extractor, loader, since)
+            await reindexer.finish(alias, name)
+            before_swap = await now()
+            await _catch_up(alias, name, extractor, loader,
+                            _watermarks(alias, mark))
+        except BaseException:
+            # Недогруженный индекс не должен оставаться в кластере
+            await client.indices.delete(index=name)
+            raise
+
+        old = await reindexer.swap(alias, name)
+        # То, что ETL успел записать в прежний индекс между второй
+        # догрузкой и переключением
+        await _catch_up(alias, name, extractor, loader,
+                        _watermarks(alias, before_swap))
+        await _bump_generation(alias)
+        if old and not args.keep_old:
+            await client.indices.delete(index=','.join(old))
+            logging.info(f'Удалены индексы {", ".join(old)}')
+    finally:
+        await loader.close()
+        await pool.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перестроение индекса '
+                                                 'с переключением псевдонима')
+    parser.add_argument('index', choices=sorted(schemas),
+                        help='псевдоним, по которому читает content_api')
+    parser.add_argument('--source', choices=['postgres', 'index'],
+                        default='postgres',
+                        help='откуда брать документы')
+    parser.add_argument('--keep-old', action='store_true',
+                        help='не удалять прежние индексы')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timezone
+
+import orjson
+
+# Отметка для таблиц, которые еще ни разу не загружались
+MIN_MODIFIED = datetime.min.replace(tzinfo=timezone.utc)
+MIN_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class JsonFileStorage:
+    """Хранит состояние в json-файле. Файл заменяется атомарно."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def retrieve_state(self) -> dict:
+        try:
+            with open(self.file_path, 'rb') as file:
+                return orjson.loads(file.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return {}
+
+    def save_state(self, state: dict):
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.file_path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(orjson.dumps(state))
+            file.flush()
+            os.fsync(file.fileno())
+        # Прерванная запись не портит прежнее состояние
+        os.replace(tmp_path, self.file_path)
+
+
+class MemoryStorage:
+    """Состояние, которое не нужно сохранять между запусками."""
+
+    def __init__(self, state: dict = None):
+        self.state = state or {}
+
+    def retrieve_state(self) -> dict:
+        return self.state
+
+    def save_state(self, state: dict):
+        self.state = state
+
+
+class State:
+    """
+    Отметки (modified, id) последней загруженной строки каждой таблицы.
+    Отметка сохраняется только после загрузки пачки в Elasticsearch,
+    поэтому после падения загрузка повторяет не больше одной пачки.
+    Повтор безопасен: документы индексируются по id.
+    """
+
+    def __init__(self, storage: JsonFileStorage):
+        self.storage = storage
+        self.state = storage.retrieve_state()
+
+    def get_watermark(self, key: str) -> tuple[datetime, str]:
+        mark = self.state.get(key)
+        if not mark:
+            return MIN_MODIFIED, MIN_ID
+        return datetime.fromisoformat(mark['modified']), mark['id']
+
+    def set_watermark(self, key: str, modified: datetime, _id: str):
+        self.state[key] = {'modified': modified.isoformat(), 'id': str(_id)}
+        self.storage.save_state(self.state)
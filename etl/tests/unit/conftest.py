@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from fakeredis import aioredis
+
+# Модули ETL импортируются так же, как при запуске ETL: из src
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+# Настройки обязательны при импорте, но сами сервисы в тестах не нужны
+for name in ('DB_NAME', 'DB_USER', 'DB_PASSWORD', 'ELASTIC_HOST',
+             'REDIS_HOST'):
+    os.environ.setdefault(name, 'test')
+for name in ('ELASTIC_PORT', 'REDIS_PORT'):
+    os.environ.setdefault(name, '0')
+
+
+@pytest.fixture
+def cache():
+    return aioredis.FakeRedis()
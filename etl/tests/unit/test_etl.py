@@ -0,0 +1,75 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from etl import ETL, MISSING_KEY
+from queries import Source
+from state import MemoryStorage, State
+from tests.unit.utils import START, Extractor, Loader, row
+
+
+def _etl(tables: dict, cache=None) -> ETL:
+    return ETL(Extractor(tables), Loader(), State(MemoryStorage()),
+               batch_size=2, cache=cache)
+
+
+@pytest.mark.asyncio
+class TestProcess:
+    async def test_incremental(self):
+        tables = {'genre': [row('1'), row('2'), row('3', minutes=1)]}
+        etl = _etl(tables)
+        source = Source('genres', 'genre', 'modified')
+
+        assert (await etl.process(source)).docs == 3
+        assert etl.state.get_watermark('genres.genre') == \
+            (START.replace(minute=1), '3')
+
+        # Загружаются только строки, измененные после отметки
+        tables['genre'].append(row('4', minutes=2))
+        etl.loader.indexes.clear()
+        assert (await etl.process(source)).docs == 1
+        assert list(etl.loader.indexes['genres']) == ['4']
+
+    async def test_same_modified(self):
+        # Строки с одинаковым modified на границе пачки не теряются
+        etl = _etl({'genre': [row('1'), row('2'), row('3')]})
+        etl.extractor.batch_size = 1
+
+        await etl.process(Source('genres', 'genre', 'modified'))
+
+        assert sorted(etl.loader.indexes['genres']) == ['1', '2', '3']
+
+    async def test_targets(self):
+        etl = _etl({'genre': [row('1')]})
+        etl.targets = {'genres': 'genres_new'}
+
+        await etl.process(Source('genres', 'genre', 'modified'))
+
+        assert list(etl.loader.indexes) == ['genres_new']
+
+
+@pytest.mark.asyncio
+class TestForgetMissing:
+    async def test_loaded_documents_are_not_missing(self, cache):
+        await cache.zadd(MISSING_KEY, {'genres:1': 1, 'genres:3': 1,
+                                       'movies:1': 1})
+        etl = _etl({'genre': [row('1'), row('2')]}, cache)
+
+        await etl.process(Source('genres', 'genre', 'modified'))
+
+        # Снимаются отметки только загруженных документов этого индекса
+        assert await cache.zrange(MISSING_KEY, 0, -1) == [b'genres:3',
+                                                          b'movies:1']
+
+    async def test_cache_errors_do_not_stop_loading(self, cache, caplog):
+        async def zrem(*args):
+            raise ConnectionError('Redis is down')
+
+        cache.zrem = zrem
+        etl = _etl({'genre': [row('1')]}, cache)
+
+        throughput = await etl.process(Source('genres', 'genre',
+                                              'modified'))
+
+        assert throughput.docs == 1
+        assert '1' in etl.loader.indexes['genres']
+        assert 'Redis is down' in caplog.text
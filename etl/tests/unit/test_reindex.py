@@ -0,0 +1,72 @@
+import pytest
+
+import reindex
+from reindex import Reindexer
+
+
+class Indices:
+    """Псевдонимы и индексы Elasticsearch в памяти."""
+
+    def __init__(self, indexes: list[str], aliases: dict[str, list[str]]):
+        self.indexes = indexes
+        self.aliases = aliases
+        self.actions = []
+
+    async def exists_alias(self, name: str) -> bool:
+        return name in self.aliases
+
+    async def get_alias(self, name: str) -> dict:
+        return {index: {'aliases': {name: {}}}
+                for index in self.aliases[name]}
+
+    async def exists(self, index: str) -> bool:
+        return index in self.indexes
+
+    async def update_aliases(self, body: dict):
+        self.actions = body['actions']
+
+
+class Client:
+    def __init__(self, indices: Indices):
+        self.indices = indices
+
+
+def _reindexer(indices: Indices) -> Reindexer:
+    return Reindexer(Client(indices), loader=None, scroll_slices=1,
+                     scroll_size=10)
+
+
+@pytest.mark.asyncio
+class TestReindex:
+    async def test_swap_alias(self):
+        indices = Indices(['movies_1', 'movies_2'], {'movies': ['movies_1']})
+
+        old = await _reindexer(indices).swap('movies', 'movies_2')
+
+        assert old == ['movies_1']
+        assert indices.actions == [
+            {'add': {'index': 'movies_2', 'alias': 'movies'}},
+            {'remove': {'index': 'movies_1', 'alias': 'movies'}}]
+
+    async def test_swap_index(self):
+        # Первое перестроение: индекс еще называется так же, как псевдоним
+        indices = Indices(['movies', 'movies_2'], {})
+
+        old = await _reindexer(indices).swap('movies', 'movies_2')
+
+        assert old == []
+        assert indices.actions == [
+            {'add': {'index': 'movies_2', 'alias': 'movies'}},
+            {'remove_index': {'index': 'movies'}}]
+
+    async def test_bump_generation(self, cache, monkeypatch):
+        monkeypatch.setattr(reindex, 'Redis', lambda **params: cache)
+        pubsub = cache.pubsub()
+        await pubsub.subscribe(reindex.INVALIDATE_CHANNEL)
+        await pubsub.get_message(timeout=1)
+
+        await reindex._bump_generation('movies')
+
+        assert await cache.get('generation:movies') == b'1'
+        message = await pubsub.get_message(timeout=1)
+        assert message['data'] == b'reindex:generation:movies'
@@ -0,0 +1,26 @@
+from state import MIN_ID, MIN_MODIFIED, JsonFileStorage, MemoryStorage, \
+    State
+from tests.unit.utils import START
+
+
+class TestState:
+    def test_default(self):
+        state = State(MemoryStorage())
+
+        assert state.get_watermark('genres.genre') == (MIN_MODIFIED, MIN_ID)
+
+    def test_file(self, tmp_path):
+        path = str(tmp_path / 'state' / 'etl_state.json')
+        State(JsonFileStorage(path)).set_watermark('genres.genre', START,
+                                                   '789')
+
+        # После перезапуска загрузка продолжается с той же строки
+        state = State(JsonFileStorage(path))
+        assert state.get_watermark('genres.genre') == (START, '789')
+
+    def test_corrupted_file(self, tmp_path):
+        path = tmp_path / 'etl_state.json'
+        path.write_text('{')
+
+        state = State(JsonFileStorage(str(path)))
+        assert state.get_watermark('genres.genre') == (MIN_MODIFIED, MIN_ID)
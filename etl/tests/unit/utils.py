@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def row(_id: str, minutes: int = 0) -> dict:
+    """Строка таблицы, измененная через minutes минут после START."""
+    return {'id': _id, 'modified': START + timedelta(minutes=minutes)}
+
+
+class Extractor:
+    """Postgres в памяти: {таблица: строки}. Документ - это id строки."""
+
+    def __init__(self, tables: dict[str, list[dict]], batch_size: int = 2):
+        self.tables = tables
+        self.batch_size = batch_size
+
+    async def changed(self, table: str, column: str, since: tuple):
+        rows = sorted((r for r in self.tables.get(table, [])
+                       if (r['modified'], r['id']) > since),
+                      key=lambda r: (r['modified'], r['id']))
+        for i in range(0, len(rows), self.batch_size):
+            yield rows[i:i + self.batch_size]
+
+    async def fetch(self, query: str, ids: list) -> list[dict]:
+        return [{'id': _id} for _id in ids]
+
+
+class Loader:
+    """Elasticsearch в памяти: {индекс: {id: документ}}."""
+
+    def __init__(self):
+        self.indexes: dict[str, dict[str, dict]] = {}
+
+    async def load(self, index: str, docs: list[dict]) -> int:
+        self.indexes.setdefault(index, {}).update(
+            {doc['id']: doc for doc in docs})
+        return len(docs)